@@ -0,0 +1,236 @@
+import json
+import random
+import platform
+import tracemalloc
+import statistics
+from time import perf_counter
+from datetime import datetime, timezone
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.conf import settings
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework.renderers import JSONRenderer
+
+from jsonapi.instrumentation import Profile
+from jsonapi.serializer_model_async import ModelSerializerAsync
+from adrf_jsonapi.models import Test, TestIncluded, TestIncludedRelation
+from adrf_jsonapi.serializers import TestSerializer, TestModelSerializer
+
+BATCH_SIZE = 10000
+
+
+class TestSerializerAsync(ModelSerializerAsync):
+    class Meta:
+        model, fields = Test, '__all__'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the jsonapi serializers and endpoints on generated fixtures '
+        'and prints the results as JSON. The fixtures are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000],
+                            help='Numbers of Test rows to generate, e.g. 1000 100000.')
+        parser.add_argument('--fanout', type=int, nargs='+', default=[3],
+                            help='Many-to-many links per row.')
+        parser.add_argument('--page', type=int, default=1000,
+                            help='Rows serialized per call and per list request.')
+        parser.add_argument('--payload', type=int, default=10000,
+                            help='Items of the validated payload normalized per call.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per case, the median time is reported.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to a file.')
+        parser.add_argument('--compare', help='Results file of a previous run.')
+
+    def handle(self, *args, **options):
+        results = []
+        for rows in options['rows']:
+            for fanout in options['fanout']:
+                try:
+                    with transaction.atomic(), override_settings(
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+                    ):
+                        self.create_fixtures(rows, fanout, options['seed'])
+                        results.extend({'fixture': {'rows': rows, 'fanout': fanout}, **case}
+                                       for case in async_to_sync(self.run_cases)(options))
+                        raise Rollback
+                except Rollback:
+                    pass
+        report = {'meta': {
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(), 'django': django.get_version(),
+            'page': options['page'], 'repeat': options['repeat'], 'seed': options['seed']
+        }, 'results': results}
+        if options['compare']:
+            report['comparison'] = self.compare(options['compare'], results)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def create_fixtures(self, rows, fanout, seed):
+        rand = random.Random(seed)
+        size = max(rows // 10, fanout, 1)
+        relations = TestIncludedRelation.objects.bulk_create([
+            TestIncludedRelation(text_included_relation=f'relation {i}',
+                                 array_included_relation=[i, i])
+            for i in range(size)
+        ], batch_size=BATCH_SIZE)
+        included = TestIncluded.objects.bulk_create([
+            TestIncluded(text_included=f'included {i}', array_included=[i, i],
+                         foreign_key_included=rand.choice(relations))
+            for i in range(size)
+        ], batch_size=BATCH_SIZE)
+        self.create_links(TestIncluded.many_to_many_included.through,
+                          included, relations, fanout, rand)
+        for start in range(0, rows, BATCH_SIZE):
+            objects = Test.objects.bulk_create([
+                Test(text=f'test {i}', int=i, array=[i, i],
+                     foreign_key=rand.choice(included))
+                for i in range(start, min(start + BATCH_SIZE, rows))
+            ])
+            self.create_links(Test.many_to_many.through, objects, included, fanout, rand)
+        self.staff = User.objects.create_user('jsonapi-benchmark', is_staff=True)
+
+    @staticmethod
+    def create_links(through, objects, related, fanout, rand):
+        source, target = (field.attname for field in through._meta.fields[1:3])
+        through._default_manager.bulk_create([
+            through(**{source: obj.pk, target: rel.pk}) for obj in objects
+            for rel in rand.sample(related, min(fanout, len(related)))
+        ], batch_size=BATCH_SIZE)
+
+    async def run_cases(self, options):
+        page, repeat = options['page'], options['repeat']
+        queryset = Test.objects.prefetch_related('many_to_many') \
+            .select_related('foreign_key').order_by('id')
+        cases = {}
+        for serializer in (TestSerializer, TestModelSerializer):
+            for is_included_disabled in (False, True):
+                name = '{}:{}'.format(serializer.__name__, 'no-included'
+                                      if is_included_disabled else 'included')
+                cases[f'serializer:{name}'] = self.serialize(
+                    serializer, queryset[:page], is_included_disabled
+                )
+        cases['serializer:ModelSerializerAsync'] = self.serialize_model_async(queryset[:page])
+        cases['serializer:validated_data'] = self.normalize(
+            [obj async for obj in queryset[:page]], options['payload']
+        )
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.staff)
+        obj = await queryset.afirst()
+        cases['endpoint:list'] = self.request(client.get, page, reverse('test-list'),
+                                              {'page[limit]': page})
+        cases['endpoint:retrieve'] = self.request(client.get, 1,
+                                                  reverse('test-detail', args=[obj.pk]))
+        cases['endpoint:create'] = self.request(
+            client.post, 1, reverse('test-list'), await self.get_create_payload(obj),
+            content_type='application/json'
+        )
+        return [{'name': name, **await self.measure(case, repeat)}
+                for name, case in cases.items()]
+
+    @staticmethod
+    def serialize(serializer, queryset, is_included_disabled):
+        async def run():
+            data = await serializer(queryset, many=True, context={
+                'is_included_disabled': is_included_disabled
+            }).data
+            return len(data['data'])
+        return run
+
+    @staticmethod
+    def serialize_model_async(queryset):
+        async def run():
+            objects = [obj async for obj in queryset]
+            return len(await TestSerializerAsync(objects, many=True).data)
+        return run
+
+    @staticmethod
+    def normalize(objects, size):
+        validated_data = [
+            {'text': obj.text, 'int': obj.int, 'foreign_key': obj.foreign_key,
+             'many_to_many': list(obj.many_to_many.all())}
+            for obj in (objects[i % len(objects)] for i in range(size))
+        ]
+
+        async def run():
+            serializer = TestModelSerializer(many=True)
+            serializer._validated_data = validated_data
+            return len(await serializer.validated_data)
+        return run
+
+    @staticmethod
+    def request(method, rows, *args, **kwargs):
+        async def run():
+            response = await method(*args, **kwargs)
+            if response.status_code >= 400:
+                raise CommandError(f'{args[0]} returned {response.status_code}')
+            return rows
+        return run
+
+    @staticmethod
+    async def get_create_payload(obj):
+        data = (await TestSerializer(obj, context={'is_included_disabled': True}).data)['data']
+        del data['id']
+        data['relationships'] = {key: {'data': val['data']}
+                                 for key, val in data.get('relationships', {}).items()}
+        return JSONRenderer().render({'data': data})
+
+    @staticmethod
+    async def measure(case, repeat):
+        timings, queries = [], []
+        for _ in range(repeat):
+            with Profile() as profile:
+                await profile.install()
+                start = perf_counter()
+                rows = await case()
+                timings.append(perf_counter() - start)
+            queries.append(sum(value['count'] for value in profile.queries.values()))
+        seconds = statistics.median(timings)
+        # One more run under tracemalloc, which would skew the timings
+        is_tracing = tracemalloc.is_tracing()
+        if not is_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        await case()
+        peak = tracemalloc.get_traced_memory()[1] - start_size
+        if not is_tracing:
+            tracemalloc.stop()
+        return {
+            'rows': rows, 'seconds': round(seconds, 6),
+            'rows_per_s': round(rows / seconds, 1) if seconds else None,
+            'queries': max(queries),
+            'peak_alloc_kb': round(peak / 1024, 1)
+        }
+
+    @staticmethod
+    def compare(path, results):
+        with open(path) as file:
+            previous = {(json.dumps(result['fixture'], sort_keys=True), result['name']): result
+                        for result in json.load(file)['results']}
+        comparison = []
+        for result in results:
+            old = previous.get((json.dumps(result['fixture'], sort_keys=True), result['name']))
+            if old is None or not old['rows_per_s'] or not result['rows_per_s']:
+                continue
+            comparison.append({
+                'fixture': result['fixture'], 'name': result['name'],
+                'speedup': round(result['rows_per_s'] / old['rows_per_s'], 3),
+                'queries_delta': result['queries'] - old['queries']
+            })
+        return comparison
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import statistics
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARKER = 'jsonapi-importtime'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the import time of the jsonapi modules with `python -X importtime`, '
+        'each in a fresh interpreter after Django has been set up, and prints the '
+        'results as JSON.'
+    )
+    default_modules = (
+        'jsonapi.viewsets', 'jsonapi.serializers', 'jsonapi.model_serializers',
+        'jsonapi.serializer_model_async', 'jsonapi.cache', 'jsonapi.instrumentation'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', nargs='+', default=list(self.default_modules))
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Interpreters per module, the median time is reported.')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Number of the slowest imports to list per module.')
+        parser.add_argument('--output', help='Write the results to a file.')
+
+    def handle(self, *args, **options):
+        if not settings.SETTINGS_MODULE:
+            raise CommandError('The settings must be configured with DJANGO_SETTINGS_MODULE.')
+        results = []
+        for module in options['modules']:
+            runs = sorted((self.measure(module) for _ in range(options['repeat'])),
+                          key=lambda run: run['total_ms'])
+            run = runs[len(runs) // 2]
+            results.append({
+                'module': module,
+                'startup_ms': statistics.median(run['startup_ms'] for run in runs),
+                'total_ms': run['total_ms'], 'loaded': len(run['imports']),
+                'top': sorted(run['imports'], key=lambda item: item['self_ms'],
+                              reverse=True)[:options['top']]
+            })
+        output = json.dumps({'meta': {
+            'python': sys.version.split()[0], 'repeat': options['repeat']
+        }, 'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def measure(module):
+        """
+        Imports `module` in a new interpreter and parses the `-X importtime`
+        lines written after `django.setup()`.
+        """
+        code = (f'import sys, django; django.setup(); '
+                f'sys.stderr.write({MARKER!r} + "\\n"); import {module}')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+               'PYTHONPATH': os.pathsep.join(filter(None, sys.path))}
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                 capture_output=True, text=True, env=env)
+        if process.returncode:
+            raise CommandError(f'Importing {module} failed:\n{process.stderr[-2000:]}')
+        before, _, after = process.stderr.partition(MARKER + '\n')
+        startup, imports = Command.parse(before), Command.parse(after)
+        return {
+            'startup_ms': Command.get_total(startup),
+            'total_ms': Command.get_total(imports),
+            'imports': [{'name': name, 'self_ms': self_ms, 'cumulative_ms': cumulative_ms}
+                        for name, _, self_ms, cumulative_ms in imports]
+        }
+
+    @staticmethod
+    def parse(output):
+        imports = []
+        for line in output.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            imports.append((name.strip(), len(name) - len(name.lstrip()),
+                            int(self_us) / 1000, int(cumulative_us) / 1000))
+        return imports
+
+    @staticmethod
+    def get_total(imports):
+        """
+        The sum of the cumulative times of the outermost imports.
+        """
+        if not imports:
+            return 0.0
+        depth = min(item[1] for item in imports)
+        return round(sum(item[3] for item in imports if item[1] == depth), 3)
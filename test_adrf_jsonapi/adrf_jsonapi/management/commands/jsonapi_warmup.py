@@ -0,0 +1,20 @@
+import json
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from asgiref.sync import async_to_sync
+
+from jsonapi.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Compiles the serializer fields, row plans, presets, types and links of every '
+        'routed JSONAPIViewSet and prints what was compiled and how long it took.'
+    )
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        report = async_to_sync(warm_up)()
+        self.stdout.write(json.dumps({
+            'seconds': round(perf_counter() - start, 6), 'results': report
+        }, indent=2))
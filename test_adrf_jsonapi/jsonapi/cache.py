@@ -0,0 +1,183 @@
+from time import time_ns
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.http.response import HttpResponse
+
+from .helpers import get_model_type
+
+# Set `JSONAPI_CACHE` to use a cache alias other than 'default'
+
+# Query parameter families that make up the cache key, matched by prefix
+key_params = ('filter[', 'sort', 'page[', 'include', 'fields[')
+# Comma separated parameters whose items are unordered
+unordered_params = ('include', 'fields[')
+# The models `watch_model()` was called for
+watched_models = set()
+
+
+def get_cache():
+    return caches[getattr(settings, 'JSONAPI_CACHE', 'default')]
+
+
+def normalize_query(query_params, extra=(), ignored=()):
+    """
+    Returns the JSON:API parameters in a canonical form: sorted by name and
+    value, percent-encoded the same way, with the items of `include` and
+    `fields[...]` sorted. `extra` names more parameters to keep, `ignored`
+    prefixes of the JSON:API ones to leave out.
+    """
+    params = []
+    for key, values in query_params.lists():
+        if not key.startswith(key_params) and key not in extra or key.startswith(ignored):
+            continue
+        for val in values:
+            if key.startswith(unordered_params):
+                val = ','.join(sorted(filter(None, val.split(','))))
+            params.append((key, val))
+    return urlencode(sorted(params))
+
+
+def get_dependencies(model, query_params=None):
+    """
+    Returns the models a compound document of `model` is built from: the
+    model, its related models, which are included by default, and the
+    models along the `include` paths.
+    """
+    models = {model}
+    models.update(field.related_model for field in model._meta.get_fields()
+                  if field.is_relation and field.related_model is not None)
+    paths = ','.join(query_params.getlist('include')) if query_params else ''
+    for path in filter(None, paths.split(',')):
+        current = model
+        for name in path.split('.'):
+            try:
+                current = current._meta.get_field(name).related_model
+            except FieldDoesNotExist:
+                break
+            if current is None:
+                break
+            models.add(current)
+    return models
+
+
+def _get_version_key(model):
+    return f'jsonapi:version:{get_model_type(model)}'
+
+
+async def get_versions(models):
+    """
+    Returns the version counters of the types, starting the missing ones at
+    the current time, so an evicted counter never repeats an old value.
+    """
+    cache, keys = get_cache(), sorted(_get_version_key(model) for model in models)
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time_ns(), None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """
+    Invalidates the cached responses that depend on the type of `model`. 
+    Saves, deletes and many-to-many changes of the watched models call it
+    through the model signals, see `watch_model`; call it after `update()`
+    and `bulk_create()`, which send none.
+    """
+    cache, key = get_cache(), _get_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time_ns(), None)
+
+
+async def abump_version(model):
+    cache, key = get_cache(), _get_version_key(model)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, time_ns(), None)
+
+
+def cache_response(handler):
+    """
+    Caches the rendered bytes of a successful GET response for
+    `cache_timeout` seconds when it is set on the viewset, or for the `ttl`
+    of the selected preset. Any change to the resource type or the types it
+    includes invalidates the entry.
+    """
+    @wraps(handler)
+    async def wrapper(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return await handler(self, request, *args, **kwargs)
+        timeout = await self.get_cache_timeout(request)
+        if timeout is None:
+            return await handler(self, request, *args, **kwargs)
+        # Before anything is cached, for viewsets whose caching was enabled
+        # after the class was created
+        watch_model(self.queryset.model)
+        cache = get_cache()
+        key = await self.get_cache_key(request)
+        cached = await cache.aget(key)
+        if cached is not None:
+            content, status, headers = cached
+            response = HttpResponse(content, status=status)
+            for header, val in headers:
+                response[header] = val
+            return response
+        response = await self.render_response(
+            request, await handler(self, request, *args, **kwargs)
+        )
+        if response.status_code == 200:
+            await cache.aset(key, (response.content, response.status_code,
+                                   list(response.items())), timeout)
+        return response
+    return wrapper
+
+
+def _invalidate(sender, **kwargs):
+    bump_version(sender)
+
+
+def _invalidate_m2m(sender, instance, model, **kwargs):
+    if kwargs['action'].startswith('post_'):
+        bump_version(instance.__class__)
+        bump_version(model)
+
+
+def get_related_models(model):
+    """
+    Returns `model` and every model reachable from it through relations,
+    which covers any `include` path a cached document can follow.
+    """
+    models, pending = set(), [model]
+    while pending:
+        current = pending.pop()
+        if current not in models:
+            models.add(current)
+            pending.extend(field.related_model for field in current._meta.get_fields()
+                           if field.is_relation and field.related_model is not None)
+    return models
+
+
+def watch_model(model):
+    """
+    Connects the invalidation receivers to the models a cached response of
+    `model` can depend on. `JSONAPIViewSet` calls it for the subclasses
+    that cache their responses, and `cache_response()` before it caches
+    one; the other models keep their fast deletes.
+    """
+    if model in watched_models:
+        return
+    watched_models.add(model)
+    for current in get_related_models(model):
+        post_save.connect(_invalidate, sender=current, dispatch_uid='jsonapi_cache_save')
+        post_delete.connect(_invalidate, sender=current, dispatch_uid='jsonapi_cache_delete')
+        for field in current._meta.local_many_to_many:
+            m2m_changed.connect(_invalidate_m2m, sender=field.remote_field.through, 
+                                dispatch_uid='jsonapi_cache_m2m')
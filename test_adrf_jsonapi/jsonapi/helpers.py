@@ -1,13 +1,18 @@
 from re import findall
 from copy import deepcopy
-from django.db import models
+from django.db import models, router, transaction
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
 from django.utils.text import capfirst
 from asyncio import iscoroutinefunction
-from asgiref.sync import sync_to_async
 from rest_framework.reverse import reverse
 from rest_framework.response import Response
 from rest_framework.validators import UniqueValidator
 
+from . import instrumentation
+from .instrumentation import sync_to_async
+from .resources import ResourceIdentifier
+
 getattr, reverse, deepcopy = sync_to_async(getattr), sync_to_async(reverse), sync_to_async(deepcopy)
 findall = sync_to_async(findall)
 
@@ -35,7 +40,7 @@ async def get_errors_formatted(serializer):
         msg = 'You must call `.is_valid()` before accessing `.errors`.'
         raise AssertionError(msg)
     elif serializer._errors.get('errors', None):
-        errors_remplate['errors'] = serializer._errors
+        errors_remplate['errors'] = serializer._errors['errors']
         return errors_remplate
     error_details = []
     for key, val in serializer._errors.items():
@@ -60,8 +65,272 @@ async def get_errors_formatted(serializer):
     return serializer._errors
 
 
+def get_error_objects(errors, pointer, sections=None):
+    """
+    Returns the JSON:API error objects of a validation error detail, with
+    `pointer` + `/attributes/<name>` or `/relationships/<name>` sources. 
+    `sections` maps the flattened field names to their member. No thread 
+    handoffs, so it can run for every item of a bulk payload.
+    """
+    objects = []
+    for key, val in errors.items():
+        if type(val) == dict:
+            objects.extend(get_error_objects(
+                {f'{key}.{name}': detail for name, detail in val.items()}, pointer, sections
+            ))
+            continue
+        section, _, name = key.rpartition('.')
+        if key in ('type', 'type.type', 'id'):
+            source = f'{pointer}/{key.split(".")[0]}'
+        elif section in ('attributes', 'relationships'):
+            source = f'{pointer}/{section}/{name}'
+        elif sections and key in sections:
+            source = f'{pointer}/{sections[key]}/{key}'
+        else:
+            source = pointer
+        message = val[0] if type(val) in (list, tuple) and val else val
+        objects.append({'code': 403, 'source': {'pointer': source}, 'detail': 
+                        f'The JSON field "{key}" caused an exception: {str(message).lower()}'})
+    return objects
+
+
+# The type registry: model class <-> JSON:API resource type
+model_types, type_models = {}, {}
+
+
+def register_type(model, obj_type=None):
+    if obj_type is None:
+        obj_type = '-'.join(findall.func('[A-Z][^A-Z]*', model.__name__)).lower()
+    model_types[model] = obj_type
+    type_models.setdefault(obj_type, model)
+    return obj_type
+
+
+def get_model_type(model):
+    try:
+        return model_types[model]
+    except KeyError:
+        return register_type(model)
+
+
 async def get_type_from_model(obj_type):
-    return '-'.join(await findall('[A-Z][^A-Z]*', obj_type.__name__)).lower()
+    return get_model_type(obj_type)
+
+
+async def get_model_from_type(obj_type):
+    if obj_type not in type_models:
+        for model in apps.get_models():
+            get_model_type(model)
+    return type_models.get(obj_type)
+
+
+def get_to_one_field(model, field_name):
+    """
+    Returns the forward foreign key or one-to-one model field, which
+    holds the related object id in the local `<field_name>_id` column.
+    """
+    try:
+        field = model._meta.get_field(field_name)
+    except (AttributeError, FieldDoesNotExist):
+        return None
+    if field.concrete and (field.many_to_one or field.one_to_one):
+        return field
+    return None
+
+
+def get_to_many_field(model, field_name):
+    """
+    Returns the (through model, source column, target column, related model)
+    of a forward or reverse many-to-many relation, or None.
+    """
+    try:
+        field = model._meta.get_field(field_name)
+    except (AttributeError, FieldDoesNotExist):
+        return None
+    if not field.many_to_many:
+        return None
+    elif field.auto_created:
+        field, source, target = field.field, 'm2m_reverse_field_name', 'm2m_field_name'
+    else:
+        source, target = 'm2m_field_name', 'm2m_reverse_field_name'
+    through = field.remote_field.through
+    return (
+        through, through._meta.get_field(getattr.func(field, source)()).attname,
+        through._meta.get_field(getattr.func(field, target)()).attname,
+        field.related_model if field.model == model else field.model
+    )
+
+
+def get_prefetched_objects(instance, field_name):
+    if not getattr.func(instance, '_prefetched_objects_cache', None):
+        return None
+    try:
+        queryset = getattr.func(instance, field_name).get_queryset()
+    except AttributeError:
+        return None
+    return queryset._result_cache
+
+
+def get_cached_related_objects(instance, field_name):
+    """
+    Returns the related objects from the `select_related()` or the 
+    `prefetch_related()` cache, or None when they were not loaded.
+    """
+    field = get_to_one_field(instance.__class__, field_name)
+    if field is None:
+        return get_prefetched_objects(instance, field_name)
+    elif getattr.func(instance, field.attname) is None:
+        return []
+    elif field.is_cached(instance):
+        return [field.get_cached_value(instance)]
+    return None
+
+
+async def get_to_many_linkage(model, field_name, ids):
+    """
+    Returns {id: [related ids]} for all the given ids with one query on the
+    through table, without loading the related rows.
+    """
+    through, source, target, _ = get_to_many_field(model, field_name)
+    linkage = {pk: [] for pk in ids}
+    queryset = through._default_manager.filter(**{f'{source}__in': ids})
+    with instrumentation.queries('linkage'):
+        async for source_id, target_id in queryset.values_list(source, target).order_by('pk'):
+            linkage[source_id].append(target_id)
+    return linkage
+
+
+async def get_relationship_data(instance, field_name, linkage=None):
+    """
+    Resource identifier linkage of a relationship. To-one identifiers are
+    read from the local `<field_name>_id` column, so they need neither a
+    join nor a query. To-many identifiers come from the page `linkage`,
+    the `prefetch_related()` cache or a through table query, in this order.
+    """
+    field = get_to_one_field(instance.__class__, field_name)
+    if field is not None:
+        pk = getattr.func(instance, field.attname)
+        return None if pk is None else ResourceIdentifier(get_model_type(field.related_model), pk)
+    to_many = get_to_many_field(instance.__class__, field_name)
+    if to_many is not None:
+        rel_type = get_model_type(to_many[3])
+        if linkage and field_name in linkage:
+            ids = linkage[field_name].get(instance.pk, [])
+        elif get_prefetched_objects(instance, field_name) is not None:
+            ids = [obj.pk for obj in get_prefetched_objects(instance, field_name)]
+        else:
+            ids = (await get_to_many_linkage(
+                instance.__class__, field_name, [instance.pk]
+            ))[instance.pk]
+        return [ResourceIdentifier(rel_type, pk) for pk in ids]
+    value = await getattr(instance, field_name)
+    objects = [ResourceIdentifier(get_model_type(obj.__class__), obj.pk) 
+               for obj in await get_related_field_objects(value)]
+    if hasattr(value, 'all'):
+        return objects
+    return objects[0] if objects else None
+
+
+def get_linkage_type(data):
+    if type(data) == list:
+        data = data[0] if data else None
+    return data.get('type') if data else None
+
+
+def to_resource_identifiers(validated_data):
+    """
+    Returns a copy of the validated data, one dict or a list of them, with
+    the model instances, also inside lists, replaced by resource identifiers.
+    One pass, and the type of each model is looked up once.
+    """
+    types = {}
+
+    def identify(value):
+        if isinstance(value, models.Model):
+            model = value.__class__
+            if model not in types:
+                types[model] = get_model_type(model)
+            return ResourceIdentifier(types[model], value.pk)
+        elif type(value) in (list, tuple) and value and isinstance(value[0], models.Model):
+            return [identify(item) for item in value]
+        return value
+
+    if type(validated_data) != list:
+        return {name: identify(value) for name, value in validated_data.items()}
+    return [{name: identify(value) for name, value in obj.items()}
+            if type(obj) == dict else identify(obj) for obj in validated_data]
+
+
+async def get_related_instance(instance, field_name):
+    """
+    Returns the related object(s), reading a to-one relation from the 
+    `select_related()` cache without a thread handoff when it is there.
+    """
+    objects = get_cached_related_objects(instance, field_name)
+    if objects is not None:
+        return list(objects)
+    return await get_related_field_objects(await getattr(instance, field_name))
+
+
+def get_relationship_query(queryset, pk, field_name):
+    """
+    Returns (related model, is to-many, queryset of the related ids) for a
+    relationship of the object `pk` of `queryset`. The ids are read from the
+    local column, the through table or the related table without loading 
+    the object, and only while the object is in `queryset`.
+    """
+    model = queryset.model
+    try:
+        field = model._meta.get_field(field_name)
+    except (AttributeError, FieldDoesNotExist):
+        return None
+    if not field.is_relation or field.related_model is None:
+        return None
+    parent = queryset.filter(pk=pk).prefetch_related(None)
+    to_one = get_to_one_field(model, field_name)
+    if to_one is not None:
+        return to_one.related_model, False, parent.values_list(to_one.attname, flat=True)
+    to_many = get_to_many_field(model, field_name)
+    if to_many is not None:
+        through, source, target, related_model = to_many
+        queryset = through._default_manager.filter(**{f'{source}__in': parent.values('pk')})
+        return related_model, True, queryset.values_list(target, flat=True).order_by('pk')
+    queryset = field.related_model._default_manager.filter(
+        **{f'{field.field.attname}__in': parent.values('pk')}
+    )
+    return field.related_model, field.one_to_many, \
+        queryset.values_list('pk', flat=True).order_by('pk')
+
+
+@sync_to_async
+def update_to_many_linkage(queryset, pk, field_name, ids, action='replace'):
+    """
+    Replaces, adds or removes many-to-many linkage of the object `pk` of 
+    `queryset` in one transaction: one query reads the current through table
+    rows, then the related manager's `remove()` and `add()` apply only the 
+    difference, so `m2m_changed` is sent and the through defaults apply. The
+    related ids must be validated beforehand. Returns the (added, removed) 
+    ids, or None if the object is not in `queryset`.
+    """
+    through, source, target, _ = get_to_many_field(queryset.model, field_name)
+    field, ids = queryset.model._meta.get_field(field_name), set(ids)
+    with transaction.atomic(using=router.db_for_write(through)):
+        parent = queryset.select_related(None).prefetch_related(None).only('pk') \
+            .filter(pk=pk).first()
+        if parent is None:
+            return None
+        current = set(through._default_manager.filter(**{source: pk})
+                      .values_list(target, flat=True))
+        added = set() if action == 'remove' else ids - current
+        removed = ids & current if action == 'remove' else \
+            set() if action == 'add' else current - ids
+        manager = getattr.func(parent, field.get_accessor_name() if field.auto_created 
+                               else field.name)
+        if removed:
+            manager.remove(*sorted(removed))
+        if added:
+            manager.add(*sorted(added))
+    return added, removed
 
 
 async def get_related_field(queryset, kwargs):
@@ -76,7 +345,10 @@ async def get_related_field(queryset, kwargs):
 
 async def get_related_field_objects(field):
     try:
-        field = [obj async for obj in field.all()]
+        queryset = field.all()
+        if queryset._result_cache is not None:
+            return list(queryset._result_cache)
+        field = [obj async for obj in queryset]
     except (AttributeError, TypeError):
         field = [field] if field else []
     return field
@@ -103,7 +375,7 @@ def get_relation_kwargs(field_name, relation_info):
     model_field, related_model, to_many, to_field, has_through_model, reverse = relation_info
     kwargs = {
         'queryset': related_model._default_manager,
-        'view_name': '-'.join(findall.func('[A-Z][^A-Z]*', related_model.__name__)).lower() + '-detail'
+        'view_name': get_model_type(related_model) + '-detail'
     }
 
     if to_many:
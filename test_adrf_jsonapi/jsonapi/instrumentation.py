@@ -0,0 +1,193 @@
+from time import perf_counter
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import Signal
+from asgiref import sync
+
+# Sent after a profiled request with the `request`, `response` and `profile`
+request_profiled = Signal()
+
+_profile = ContextVar('jsonapi_profile', default=None)
+_queries = ContextVar('jsonapi_queries', default='primary')
+_section = ContextVar('jsonapi_section', default=None)
+
+
+class SyncToAsync(sync.SyncToAsync):
+    """
+    Counts the thread handoffs of the active profile.
+    """
+    async def __call__(self, *args, **kwargs):
+        profile = _profile.get()
+        if profile is not None:
+            profile.handoffs += 1
+        return await super().__call__(*args, **kwargs)
+
+
+def sync_to_async(func=None, *, thread_sensitive=True, executor=None):
+    if func is None:
+        return lambda func: SyncToAsync(
+            func, thread_sensitive=thread_sensitive, executor=executor
+        )
+    return SyncToAsync(func, thread_sensitive=thread_sensitive, executor=executor)
+
+
+class Profile:
+    """
+    Per-request metrics of a JSON:API endpoint. Enable it with
+    `profile_class = Profile` on the viewset; override `report()` or connect
+    to `request_profiled` to collect the data.
+    """
+    query_kinds = ('primary', 'included', 'count', 'linkage')
+    sections = ('attributes', 'relationships', 'included')
+
+    def __init__(self, view=None):
+        self.view = view
+        self.queries = {kind: {'count': 0, 'time': 0.0} for kind in self.query_kinds}
+        self.serialization = dict.fromkeys(self.sections, 0.0)
+        self.render = self.total = 0.0
+        self.handoffs = 0
+        self._token = self._start = None
+
+    def __enter__(self):
+        self._token, self._start = _profile.set(self), perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.total = perf_counter() - self._start
+        _profile.reset(self._token)
+
+    def add_query(self, kind, duration, sql=None):
+        queries = self.queries.setdefault(kind, {'count': 0, 'time': 0.0})
+        queries['count'] += 1
+        queries['time'] += duration
+
+    def as_dict(self):
+        to_ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            'queries': {kind: {'count': value['count'], 'time': to_ms(value['time'])}
+                        for kind, value in self.queries.items()},
+            'serialization': {key: to_ms(val) for key, val in self.serialization.items()},
+            'render': to_ms(self.render),
+            'handoffs': self.handoffs,
+            'total': to_ms(self.total or perf_counter() - self._start)
+        }
+
+    def get_server_timing(self):
+        data, metrics = self.as_dict(), []
+        for kind, value in data['queries'].items():
+            metrics.append(f'db-{kind};dur={value["time"]};desc="{value["count"]} queries"')
+        for key, val in data['serialization'].items():
+            metrics.append(f'serialize-{key};dur={val}')
+        metrics.append(f'render;dur={data["render"]}')
+        metrics.append(f'total;dur={data["total"]}')
+        return ', '.join(metrics)
+
+    async def install(self):
+        """
+        Wraps the database connections of the thread the ORM runs in.
+        """
+        await sync.sync_to_async(install)()
+
+    async def finalize(self, request, response):
+        data = getattr(response, 'data', None)
+        if settings.DEBUG and type(data) == dict:
+            data.setdefault('meta', {})['profile'] = self.as_dict()
+        if hasattr(response, 'render') and not response.is_rendered:
+            start = perf_counter()
+            await sync.sync_to_async(response.render)()
+            self.render = perf_counter() - start
+        await self.report(request, response)
+
+    async def report(self, request, response):
+        response['Server-Timing'] = self.get_server_timing()
+        request_profiled.send(
+            sender=self.view.__class__, request=request, response=response, profile=self
+        )
+
+
+class _Section:
+    __slots__ = ('profile', 'name', 'start', 'token')
+
+    def __init__(self, profile, name):
+        self.profile, self.name = profile, name
+
+    def __enter__(self):
+        self.token, self.start = _section.set(self.name), perf_counter()
+
+    def __exit__(self, *args):
+        self.profile.serialization[self.name] += perf_counter() - self.start
+        _section.reset(self.token)
+
+
+class _Queries:
+    __slots__ = ('kind', 'token')
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __enter__(self):
+        self.token = _queries.set(self.kind)
+
+    def __exit__(self, *args):
+        _queries.reset(self.token)
+
+
+class _Disabled:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_disabled = _Disabled()
+
+
+def section(name):
+    """
+    Times a serialization section. Nested sections are counted in the outer one.
+    """
+    profile = _profile.get()
+    if profile is None or _section.get() is not None:
+        return _disabled
+    return _Section(profile, name)
+
+
+def queries(kind):
+    """
+    Labels the queries executed inside the block.
+    """
+    if _profile.get() is None:
+        return _disabled
+    return _Queries(kind)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(_queries.get(), perf_counter() - start, sql)
+
+
+def install(connection=None):
+    """
+    Wraps `connection`, or the initialized connections of the calling 
+    thread. From the first call on, the connections opened afterwards are
+    wrapped when they are created; until then no query is wrapped.
+    """
+    connection_created.connect(_install, dispatch_uid='jsonapi_instrumentation')
+    for connection in [connection] if connection else connections.all(initialized_only=True):
+        _install(None, connection)
+
+
+def _install(sender, connection, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
@@ -0,0 +1,126 @@
+from uuid import uuid4
+from asyncio import wrap_future
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from asgiref.sync import async_to_sync
+from django.db import close_old_connections
+
+
+class Job:
+    """
+    A bulk create processed in the background. Counts the items as their
+    results come in and keeps the errors of the first `max_errors` failed
+    ones.
+    """
+    type = 'jobs'
+    max_errors = 100
+
+    def __init__(self, func, *args):
+        self.id, self.func, self.args = uuid4().hex, func, args
+        self.status, self.error, self.future = 'queued', None, None
+        self.processed = self.created = self.failed = 0
+        self.errors = []
+        self.created_at, self.finished_at = datetime.now(timezone.utc), None
+        self.is_cancelled = False
+
+    def add_result(self, result):
+        self.processed += 1
+        if 'data' in result:
+            self.created += 1
+        else:
+            self.failed += 1
+            if len(self.errors) < self.max_errors:
+                self.errors.append(result)
+
+    def run(self):
+        """
+        Runs `await func(job, *args)` in an event loop of the calling worker
+        thread. Its `sync_to_async()` calls run on that thread too, with the
+        thread's own database connections.
+        """
+        close_old_connections()
+        try:
+            async_to_sync(self.arun)()
+        finally:
+            close_old_connections()
+
+    async def arun(self):
+        self.status = 'running'
+        try:
+            await self.func(self, *self.args)
+        except Exception as exc:
+            self.status, self.error = 'failed', str(exc)
+        else:
+            self.status = 'cancelled' if self.is_cancelled else 'succeeded'
+        finally:
+            self.finish()
+
+    def finish(self):
+        self.finished_at = datetime.now(timezone.utc)
+        self.func = self.args = None
+
+    def cancel(self):
+        """
+        Drops a queued job. A running one stops at its next result, which
+        `func` checks with `is_cancelled`; what it wrote is kept.
+        """
+        self.is_cancelled = True
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+            self.finish()
+
+    async def wait(self):
+        if self.future is not None and not self.future.cancelled():
+            await wrap_future(self.future)
+        return self
+
+    def to_representation(self, url=None):
+        data = {'type': self.type, 'id': self.id, 'attributes': {
+            'status': self.status, 'processed': self.processed, 'created': self.created,
+            'failed': self.failed, 'errors': self.errors, 'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at and self.finished_at.isoformat()
+        }}
+        if url:
+            data['links'] = {'self': url}
+        return data
+
+
+class JobPool:
+    """
+    Runs jobs on `workers` threads of its own, in the order they were
+    submitted, so they neither share the event loop nor queue behind the
+    requests' database calls. Keeps the last `max_jobs` jobs for lookups.
+    """
+    def __init__(self, workers=2, max_jobs=1000):
+        self.workers, self.max_jobs = workers, max_jobs
+        self.jobs = OrderedDict()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='jsonapi-jobs')
+
+    def __len__(self):
+        return sum(1 for job in self.jobs.values() if not job.future.done())
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def submit(self, func, *args):
+        """
+        Queues `await func(job, *args)` and returns the job.
+        """
+        job = Job(func, *args)
+        job.future = self._executor.submit(job.run)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        return job
+
+    def shutdown(self, wait=True, cancel=False):
+        """
+        Stops accepting jobs. With `cancel`, the unfinished jobs are
+        cancelled first; `wait` blocks until the running ones return.
+        """
+        if cancel:
+            for job in self.jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=wait)
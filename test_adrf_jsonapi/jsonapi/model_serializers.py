@@ -1,10 +1,10 @@
 import copy
 import contextlib
 import traceback
-from time import timezone
 
 from django.db import models
 from django.db.models.fields import Field as DjangoModelField
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import (
     ValidationError as DjangoValidationError, 
@@ -37,8 +37,10 @@ from rest_framework.serializers import ModelSerializer, ALL_FIELDS
 from .serializers import (JSONAPISerializer, SerializerMetaclass, 
                           JSONAPIObjectIdSerializer)
 from .helpers import (get_relation_kwargs, get_type_from_model, 
-                      to_coroutine, getattr)
-from .utils import RaiseNested
+                      to_coroutine, getattr, get_relationship_data, 
+                      get_linkage_type)
+from .utils import RaiseNested, WriteUnit, cached_property
+from . import instrumentation
 
 
 class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
@@ -51,6 +53,7 @@ class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
         serializer_field_mapping[postgres_fields.ArrayField] = ListField
         serializer_field_mapping[postgres_fields.JSONField] = JSONField
     serializer_object_id_field = JSONAPIObjectIdSerializer
+    write_unit_class = WriteUnit
     serializer_related_field = PrimaryKeyRelatedField
     serializer_related_field_many = ManyRelatedField
     serializer_related_to_field = PrimaryKeyRelatedField
@@ -64,7 +67,17 @@ class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
         """
         if self.url_field_name is None:
             self.url_field_name = api_settings.URL_FIELD_NAME
-
+        return copy.deepcopy(await self.compiled_fields)
+    
+    @cached_property(shared=True)
+    async def compiled_fields(self):
+        """
+        The fields built once per serializer class; every instance gets a 
+        copy. `jsonapi.warmup` compiles them ahead of the first request.
+        """
+        return await self.build_fields()
+    
+    async def build_fields(self):
         assert hasattr(self, 'Meta'), (
             'Class {serializer_class} missing "Meta" attribute'.format(
                 serializer_class=self.__class__.__name__
@@ -595,42 +608,28 @@ class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
         if url and not url.endswith(str(instance.id) + '/'):
             url = f"{url}{str(instance.id)}/"
         fields, included = await self.fields, {}
-        relationships = {key: {'data': await getattr(instance, key)} for key in fields['relationships'].keys()}
-        for key, val in relationships.items():
-            val = val['data'] if type(val) == dict and 'data' in val else val
-            validated_data, is_many = {}, hasattr(val, 'all')
-            if is_many:
-                objects = [obj async for obj in val.all()]
-            else:
-                objects = [val] if val else []
-            data = await JSONAPIObjectIdSerializer(objects, many=True).data
-            objects = data.get('data') if 'data' in data.keys() else data
-            if objects and not is_many:
-                objects, validated_data = objects[0], objects[0]
-            elif objects:
-                validated_data = objects
-            elif not is_many:
-                objects = None
-            relationships[key]['data'] = validated_data
-        for key in fields['relationships'].keys():
-            links = {'self': f"{url}relationships/{key}/"}
-            if relationships[key]['data']:
-                links['related'] = f"{url}{key}/"
-            relationships[key]['links'] = links
-            if type(validated_data) == list:
-                relationships[key]['links']['included'] = validated_data[0].get('type')
-            else:
-                relationships[key]['links']['included'] = validated_data
+        relationships = {}
+        with instrumentation.section('relationships'):
+            for key in fields['relationships'].keys():
+                objects = await get_relationship_data(
+                    instance, key, self._context.get('linkage')
+                )
+                links = {'self': f"{url}relationships/{key}/"}
+                if objects:
+                    links['related'] = f"{url}{key}/"
+                links['included'] = get_linkage_type(objects)
+                relationships[key] = {'data': objects, 'links': links}
         is_included = not self._context.get('is_included_disabled', False)
         if is_included:
-            await self._get_included(instance, relationships, included, not is_included)
+            with instrumentation.section('included'), instrumentation.queries('included'):
+                await self._get_included(instance, relationships, included, not is_included)
+        with instrumentation.section('attributes'):
+            attributes = {key: await getattr(instance, key) 
+                          for key in fields['attributes'].keys()}
         data = {'data': {
             'type': await get_type_from_model(instance.__class__),
             'id': await getattr(instance, 'id'),
-            'attributes': {
-                key: await getattr(instance, key) 
-                for key in fields['attributes'].keys()
-            }, 
+            'attributes': attributes, 
             'relationships': relationships,
             'links': {'self': url}
         }, 'included': list(included.values())}
@@ -638,11 +637,18 @@ class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
             del data['relationships']
         return data
 
+    async def to_representation_row(self, row, plan):
+        data = await super().to_representation_row(row, plan)
+        return {
+            'type': data['type'], 'id': data['id'],
+            'attributes': data.get('attributes', {}),
+            'relationships': data.get('relationships', {}),
+            'links': {'self': plan['url'] and f"{plan['url']}{row['id']}/"}
+        }
+
     async def to_internal_value(self, data):
-        try:
-            fields = await self.fields
-        except TypeError:
-            fields = self.fields
+        # Flattened in a copy, so the serializer can validate many objects
+        fields = dict(await self.fields)
         meta = await getattr(self, 'Meta', None)
         read_only_fields = await getattr(meta, 'read_only_fields', [])
         ret = {}
@@ -716,20 +722,9 @@ class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
 
     async def create(self, validated_data):
         await RaiseNested('create', self, validated_data).raise_nested_writes()
-
         ModelClass = self.Meta.model
-
-        # Remove many-to-many relationships from validated_data.
-        # They are not valid arguments to the default `.create()` method,
-        # as they require that the instance has already been saved.
-        info = model_meta.get_field_info(ModelClass)
-        many_to_many = {}
-        for field_name, relation_info in info.relations.items():
-            if relation_info.to_many and (field_name in validated_data):
-                many_to_many[field_name] = validated_data.pop(field_name)
-
         try:
-            instance = ModelClass._default_manager.create(**validated_data)
+            return await self.get_write_unit(ModelClass, validated_data).asave()
         except TypeError:
             tb = traceback.format_exc()
             msg = (
@@ -750,39 +745,19 @@ class JSONAPIModelSerializer(JSONAPISerializer, metaclass=SerializerMetaclass):
             )
             raise TypeError(msg)
 
-        # Save many-to-many relationships after the instance is created.
-        if many_to_many:
-            for field_name, value in many_to_many.items():
-                field = getattr(instance, field_name)
-                field.set(value)
-
-        return instance
-
     async def update(self, instance, validated_data):
         await RaiseNested('update', self, validated_data).raise_nested_writes()
-        info = model_meta.get_field_info(instance)
-
-        # Simply set each attribute on the instance, and then save it.
-        # Note that unlike `.create()` we don't need to treat many-to-many
-        # relationships as being a special case. During updates we already
-        # have an instance pk for the relationships to be associated with.
-        m2m_fields = []
-        for attr, value in validated_data.items():
-            if attr in info.relations and info.relations[attr].to_many:
-                m2m_fields.append((attr, value))
-            else:
-                setattr(instance, attr, value)
-
-        instance.save()
-
-        # Note that many-to-many fields are set after updating instance.
-        # Setting m2m fields triggers signals which could potentially change
-        # updated instance and we do not want it to collide with .update()
-        for attr, value in m2m_fields:
-            field = getattr(instance, attr)
-            field.set(value)
-
-        return instance
+        return await self.get_write_unit(
+            instance.__class__, validated_data, instance
+        ).asave()
+    
+    def get_write_unit(self, model, validated_data, instance=None):
+        """
+        The row and its many-to-many linkage are written in one transaction
+        and one thread handoff, see `WriteUnit`.
+        """
+        self._write_unit = self.write_unit_class(model, validated_data, instance)
+        return self._write_unit
 
     # TODO: test method validation
     async def validate_type(self, value):
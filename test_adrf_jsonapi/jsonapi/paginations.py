@@ -4,7 +4,9 @@ from django.contrib.sites.shortcuts import get_current_site
 from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.utils.urls import remove_query_param, replace_query_param
-from asgiref.sync import sync_to_async
+
+from . import instrumentation
+from .instrumentation import sync_to_async
 
 
 remove_query_param = sync_to_async(remove_query_param)
@@ -183,6 +185,7 @@ class LimitOffsetAsyncPagination:
     
     async def get_count(self, queryset):
         try:
-            return await queryset.acount()
+            with instrumentation.queries('count'):
+                return await queryset.acount()
         except (AttributeError, TypeError):
             return len(queryset)
@@ -0,0 +1,100 @@
+from collections.abc import Mapping
+
+
+class ResourceIdentifier(Mapping):
+    """
+    A `{"type": ..., "id": ...}` resource identifier object.
+
+    It reads like a dict and is rendered as one, but takes two slots instead
+    of a dict, and is hashable, so it can key the `included` dedup map.
+    """
+    __slots__ = ('type', 'id')
+    _keys = ('type', 'id')
+
+    def __init__(self, type, id):
+        self.type, self.id = type, id
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return 2
+
+    def __hash__(self):
+        return hash((self.type, self.id))
+
+    def __eq__(self, other):
+        if type(other) == ResourceIdentifier:
+            return self.type == other.type and self.id == other.id
+        return super().__eq__(other)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(type={self.type!r}, id={self.id!r})'
+
+    def __reduce__(self):
+        return self.__class__, (self.type, self.id)
+
+    def as_dict(self):
+        return {'type': self.type, 'id': self.id}
+
+
+class ResourceObject(ResourceIdentifier):
+    """
+    A resource object. The empty members are left out, as the serializers
+    do for dicts, and `del obj[key]` empties a member.
+
+    Its members can be replaced, so unlike an identifier it is not hashable;
+    key it by `obj.identifier` instead.
+    """
+    __slots__ = ('attributes', 'relationships', 'links')
+    _keys = ('type', 'id', 'attributes', 'relationships', 'links')
+
+    def __init__(self, type, id, attributes=None, relationships=None, links=None):
+        super().__init__(type, id)
+        self.attributes, self.relationships, self.links = attributes, relationships, links
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if not value and key not in ResourceIdentifier._keys:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self._keys:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        self[key]
+        setattr(self, key, None)
+
+    def __iter__(self):
+        return (key for key in self._keys if key in ResourceIdentifier._keys
+                or getattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    __hash__ = None
+
+    def __eq__(self, other):
+        return Mapping.__eq__(self, other)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.as_dict()!r})'
+
+    def __reduce__(self):
+        return self.__class__, (self.type, self.id, self.attributes,
+                                self.relationships, self.links)
+
+    def as_dict(self):
+        return {key: self[key] for key in self}
+
+    @property
+    def identifier(self):
+        return ResourceIdentifier(self.type, self.id)
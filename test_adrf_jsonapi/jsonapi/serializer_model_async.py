@@ -1,5 +1,4 @@
 import traceback
-import psycopg
 import asyncio
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.serializers import ModelSerializer, BaseSerializer, ListSerializer
@@ -10,7 +9,6 @@ from rest_framework.utils.serializer_helpers import (
 )
 from rest_framework.settings import api_settings
 from asgiref.sync import sync_to_async
-from adrf_jsonapi.models import TestDirectCon
 
 
 from django.db import connection
@@ -240,6 +238,8 @@ class ModelSerializerAsync(ModelSerializer):
             )(self, *args, raise_exception=False)
 
     async def acreate(self, validated_data):
+        # psycopg is only needed by the direct connection writes
+        import psycopg
         if type(validated_data) == dict:
             validated_data = [validated_data]
         else:
@@ -253,14 +253,19 @@ class ModelSerializerAsync(ModelSerializer):
         async with await psycopg.AsyncConnection.connect(**params) as aconn:
             async with aconn.cursor() as cur:
                 try:
+                    # The inserted rows come back with RETURNING instead of a re-select
                     await cur.executemany(
-                        f'INSERT INTO {table_name} ({", ".join(keys)}) VALUES ({"%s, "*len(keys)})'.replace(', )', ')'), values
+                        f'INSERT INTO {table_name} ({", ".join(keys)}) VALUES ({"%s, "*len(keys)})'.replace(', )', ')') 
+                        + ' RETURNING *', values, returning=True
                     )
-                    await cur.execute(f'SELECT * FROM {table_name} ORDER BY ID DESC LIMIT {len(values)}')
                 except psycopg.OperationalError:
                     raise psycopg.OperationalError(f'The {table_name} table have not been modified.')
                 else:
-                    row = await cur.fetchall()
+                    row = []
+                    while True:
+                        row.extend(await cur.fetchall())
+                        if not cur.nextset():
+                            break
                     row = [self.Meta.model(*obj) for obj in sorted(row)]
                     row = row.pop() if len(row) == 1 else row
                     return row
@@ -1,5 +1,9 @@
 from django.core.exceptions import (ValidationError as DjangoValidationError, 
-                                    SynchronousOnlyOperation, ImproperlyConfigured)
+                                    SynchronousOnlyOperation, ImproperlyConfigured,
+                                    FieldDoesNotExist)
+from django.conf import settings
+from django.db import models
+from django.db.models import QuerySet, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 from rest_framework.exceptions import ValidationError
@@ -9,9 +13,16 @@ from rest_framework.utils.serializer_helpers import (BoundField, JSONBoundField,
                                                      NestedBoundField, ReturnDict)
 
 from .utils import JSONAPISerializerRepr, NotSelectedForeignKey, cached_property
+from . import instrumentation
+from .instrumentation import sync_to_async
+from .resources import ResourceIdentifier, ResourceObject
 from .helpers import (getattr, deepcopy, reverse, to_coroutine, get_field_info, 
                       get_type_from_model, get_related_field_objects, 
-                      get_errors_formatted)
+                      get_errors_formatted, get_relationship_data, 
+                      get_related_instance, get_linkage_type, get_to_many_field,
+                      get_to_many_linkage, get_prefetched_objects, get_to_one_field,
+                      get_cached_related_objects, get_model_type,
+                      to_resource_identifiers, get_error_objects)
 
 
 # TODO: write an JSONAPI object describing the server’s implementation (version)
@@ -36,25 +47,30 @@ class JSONAPIBaseSerializer(Field):
         self.read_only = read_only
         self.initial = {}
         self.url_field_name = 'links'
-        self._kwargs = kwargs
+        self._kwargs = dict(kwargs)
         self._args = {}
         self.partial = kwargs.pop('partial', False)
         self.required = kwargs.pop('required', True)
         self._context = kwargs.pop('context', {})
         request = self._context.get('request')
-        if request:
+        if 'url' in self._context:
+            setattr(self, self.url_field_name, self._context['url'])
+        elif request:
             setattr(self, self.url_field_name, 
                     f'http://{request.get_host()}{request.path}')
         kwargs.pop('many', None)
         super().__init__(**kwargs)
 
-    def __new__(cls, *args, **kwargs):
-        Meta = getattr.func(cls, 'Meta', None)
-        if Meta:
-            parent_meta = cls.__bases__[0].Meta.__dict__
-            for name, attr in parent_meta.items():
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Meta inherits the missing options once, when the class is created
+        Meta, parent_meta = cls.__dict__.get('Meta'), getattr.func(cls.__bases__[0], 'Meta', None)
+        if Meta and parent_meta:
+            for name, attr in parent_meta.__dict__.items():
                 if not hasattr(Meta, name):
                     setattr(Meta, name, attr)
+
+    def __new__(cls, *args, **kwargs):
         if kwargs.pop('many', False):
             return serializers.BaseSerializer.many_init.__func__(cls, *args, **kwargs)
         return super().__new__(cls)
@@ -66,29 +82,70 @@ class JSONAPIBaseSerializer(Field):
         return cls
 
     def __aiter__(self):
-        self.iter_count = 0
+        self.iter_count, self._iter_keys = 0, None
         return self
     
     async def __anext__(self):
-        fields = await self.child.fields if self.many else self.fields
-        try:
-            key = list(fields.keys())[self.iter_count]
-        except IndexError:
+        if self._iter_keys is None:
+            # The key order is read once per iteration
+            fields = await (self.child.fields if getattr.func(self, 'many', False) 
+                            else self.fields)
+            self._iter_keys = tuple(fields.keys())
+        if self.iter_count >= len(self._iter_keys):
             raise StopAsyncIteration
-        else:
-            self.iter_count += 1
-            return await self[key]
+        key = self._iter_keys[self.iter_count]
+        self.iter_count += 1
+        return await self[key]
     
     async def __getitem__(self, key):
+        if '_bound_fields' not in self.__dict__:
+            self._bound_fields = {}
+        if key not in self._bound_fields:
+            self._bound_fields[key] = await self.get_bound_field(key)
+        return self._bound_fields[key]
+    
+    @property
+    def instance(self):
+        return self.__dict__.get('instance')
+    
+    @instance.setter
+    def instance(self, value):
+        self.__dict__['instance'] = value
+        self.reset_bound_fields()
+    
+    @cached_property
+    async def representation(self):
+        """
+        The representation of the instance the bound fields read, made once
+        per instance, see `reset_bound_fields()`.
+        """
+        return await self.__class__(self.instance, context=self._context).data
+    
+    def reset_bound_fields(self):
+        """
+        Drops the bound fields and the representation they read, once the 
+        errors or the instance change; assigning `instance` calls it.
+        """
+        self.__dict__.pop('_bound_fields', None)
+        del self.representation
+    
+    async def get_bound_field(self, key):
         fields = await self.fields
         field = fields[key]
+        if type(field) == dict:
+            # The attributes or relationships of a model serializer
+            field, data = JSONField(read_only=True), await self.representation
+            field.field_name = key
+            error = (self.__dict__.get('_errors') or {}).get(key)
+            return JSONBoundField(field, data['data'].get(key), error)
         field.field_name = key
         if isinstance(field, JSONField):
-            value = field.get_value(await self.__class__(self.instance).data)
-            error = self._errors.get(key) if hasattr(self, '_errors') else None
-            return JSONBoundField(field, value, error, key)
+            value = field.get_value(await self.representation)
+            error = (self.__dict__.get('_errors') or {}).get(key)
+            return JSONBoundField(field, value, error)
         elif isinstance(field, JSONAPIBaseSerializer):
             field = field.__class__(self.instance)
+            field.field_name = key
             data = await field.data
             data = {
                 key: val for key, val in data.items() if key != 'included'
@@ -96,15 +153,15 @@ class JSONAPIBaseSerializer(Field):
             field.initial_data = data
             await field.is_valid()
             error = await field.errors
-            return NestedBoundField(field, data, error, key)
+            return NestedBoundField(field, data, error)
         else:
-            data = await self.__class__(self.instance).data
+            data = await self.representation
             try:
                 value = data['data'].get(key)
             except KeyError:
                 value = data.get(key)
-            error = self._errors.get(key) if hasattr(self, '_errors') else None
-            return BoundField(field, value, error, key)
+            error = (self.__dict__.get('_errors') or {}).get(key)
+            return BoundField(field, value, error)
     
     def bind(self, field_name, parent):
         self.field_name, self.parent = field_name, parent
@@ -160,10 +217,7 @@ class JSONAPIBaseSerializer(Field):
     
     @property
     async def _readable_fields(self):
-        try:
-            fields = await self.fields
-        except TypeError:
-            fields = self.fields
+        fields = await self.fields
         for field in fields.values():
             if type(field) == dict and 'read_only' in field:
                 for val in field.values():
@@ -173,10 +227,7 @@ class JSONAPIBaseSerializer(Field):
     
     @property
     async def _writable_fields(self):
-        try:
-            fields = await self.fields
-        except TypeError:
-            fields = self.fields
+        fields = await self.fields
         for field in fields.values():
             if type(field) == dict and 'read_only' not in field:
                 for val in field.values():
@@ -207,6 +258,8 @@ class JSONAPIBaseSerializer(Field):
         return await self.validated_data
     
     async def is_valid(self, *, raise_exception=False):
+        # The bound fields carry the errors
+        self.reset_bound_fields()
         if not hasattr(self, '_validated_data'):
             try:
                 self._validated_data = await self.to_internal_value(self.initial_data)
@@ -225,10 +278,7 @@ class JSONAPIBaseSerializer(Field):
         read_only_fields = await getattr(meta, 'read_only_fields', [])
         ret = {}
         errors = {}
-        try:
-            fields = await self.fields
-        except TypeError:
-            fields = self.fields
+        fields = await self.fields
         for name, field in fields.items():
             if hasattr(field, 'child'):
                 field.child.required, field = field.required, field.child
@@ -275,6 +325,15 @@ class JSONAPIBaseSerializer(Field):
         else:
             return ret
     
+    async def get_row_plan(self, queryset):
+        return None
+    
+    async def get_linkage(self, instances):
+        return {}
+    
+    async def get_bulk_relations(self, instances, linkage):
+        return ()
+    
     async def to_representation(self, instance):
         raise NotImplemented('This method is not implemented')
     
@@ -283,7 +342,7 @@ class JSONAPIBaseSerializer(Field):
             'You must call `.is_valid()` before calling `.save()`.'
         )
 
-        assert not self.errors, (
+        assert not self._errors, (
             'You cannot call `.save()` on a serializer with invalid data.'
         )
 
@@ -297,25 +356,25 @@ class JSONAPIBaseSerializer(Field):
             "For example: 'serializer.save(owner=request.user)'.'"
         )
 
-        assert not hasattr(self, '_data'), (
+        # `_data` starts as the initial data, see `__init__()`
+        assert getattr.func(self, '_data', None) is getattr.func(self, 'initial_data', None), (
             "You cannot call `.save()` after accessing `serializer.data`."
             "If you need to access data before committing to the database then "
             "inspect 'serializer.validated_data' instead. "
         )
 
-        validated_data = {**self.validated_data, **kwargs}
+        validated_data = {**self._validated_data, **kwargs}
 
         if self.instance is not None:
-            self.instance = self.update(self.instance, validated_data)
+            self.instance = await self.update(self.instance, validated_data)
             assert self.instance is not None, (
                 '`update()` did not return an object instance.'
             )
         else:
-            self.instance = self.create(validated_data)
+            self.instance = await self.create(validated_data)
             assert self.instance is not None, (
                 '`create()` did not return an object instance.'
             )
-
         return self.instance
     
     @property
@@ -344,7 +403,7 @@ class JSONAPIBaseSerializer(Field):
             if self.instance is not None:
                 self._data = await self.to_representation(self.instance)
             elif hasattr(self, '_validated_data'):
-                self._data = self._validated_data
+                self._data = await self.validated_data
             else:
                 self._data = await self.get_initial()
         return ReturnDict(self._data, serializer=self)
@@ -358,18 +417,40 @@ class JSONAPIBaseSerializer(Field):
         if not hasattr(self, '_validated_data'):
             msg = 'You must call `.is_valid()` before accessing `.validated_data`.'
             raise AssertionError(msg)
-        validated_data = [self._validated_data] if type(self._validated_data) != list else self._validated_data
-
-        for obj in validated_data:
-            for name, field in list(obj.items()):
-                if hasattr(field, 'pk'):
-                    if type(self._validated_data) == list:
-                        self._validated_data.remove(field)
-                        self._validated_data.append(await JSONAPIObjectIdSerializer(field).data)
-                    else:
-                        del self._validated_data[name]
-                        self._validated_data[name] = await JSONAPIObjectIdSerializer(field).data
-        return self._validated_data
+        # Memoized for the current `_validated_data`, which is left untouched 
+        # with its model instances for `save()`
+        source, identified = getattr.func(self, '_identified_data', (None, None))
+        if source is not self._validated_data:
+            identified = to_resource_identifiers(self._validated_data)
+            self._identified_data = (self._validated_data, identified)
+        return identified
+
+
+def _is_row_compatible(serializer, resource_fields=None):
+    """
+    Rows can replace instances only if the closest `to_representation()`
+    override, on the serializer and on its attributes and relationships 
+    serializers, comes with a `to_representation_row()` counterpart, and 
+    every field reads the model column of its own name.
+    """
+    for fields in (resource_fields or {}).values():
+        for name, field in fields.items():
+            if getattr.func(field, 'source', None) not in (None, name):
+                return False
+    classes = [serializer.__class__] + [
+        field for field in (getattr.func(serializer, name, None) 
+                            for name in ('Attributes', 'Relationships'))
+        if field is not None
+    ]
+    for cls in classes:
+        for base in cls.__mro__:
+            if 'to_representation' in base.__dict__:
+                if 'to_representation_row' not in base.__dict__ and base not in (
+                    JSONAPIAttributesSerializer, JSONAPIRelationsSerializer
+                ):
+                    return False
+                break
+    return True
 
 
 class JSONAPISerializerMetaclass(SerializerMetaclass):
@@ -387,6 +468,7 @@ class JSONAPISerializerMetaclass(SerializerMetaclass):
 
 class JSONAPIManySerializer(JSONAPIBaseSerializer):
     child, many = None, True
+    default_chunk_size = 2000
     
     def __init__(self, *args, **kwargs):
         self.child = kwargs.pop('child', deepcopy.func(self.child))
@@ -395,9 +477,10 @@ class JSONAPIManySerializer(JSONAPIBaseSerializer):
         self.min_length = kwargs.pop('min_length', None)
         assert self.child is not None, '`child` is a required argument.'
         super().__init__(*args, **kwargs)
+        self._kwargs['child'] = self.child
         self.child.field_name, self.child.parent = '', self
     
-    async def __getitem__(self, key):
+    async def get_bound_field(self, key):
         fields = []
         async for obj in self.instance:
             data = self.child.__class__(obj)
@@ -416,42 +499,231 @@ class JSONAPIManySerializer(JSONAPIBaseSerializer):
                     "Please provide a list of valid objects."
                     if data else error_message
                 ]})
-        validated_data = []
-        for obj_data in data:
-            obj_data = await self.child.run_validation({'data': obj_data})
-            errors = await self.child.errors
-            if not errors:
-                validated_data.append(await self.child.validated_data)
-                del self.child._validated_data
-            else:
-                raise ValidationError(errors)
+        validated_data, errors, failed = [], [], 0
+        max_errors, sections = self.get_max_errors(), self.get_error_sections()
+        for index, obj_data in enumerate(data):
+            obj_data, obj_errors = await self.validate_item(obj_data, f'/data/{index}', sections)
+            if not obj_errors:
+                validated_data.append(obj_data)
+                continue
+            # Every error of an invalid item is kept; scanning stops once
+            # the error budget of items is spent
+            errors.extend(obj_errors)
+            failed += 1
+            if failed == max_errors:
+                break
+        if errors:
+            # Already error objects, which ValidationError need not copy again
+            exc = ValidationError()
+            exc.detail = {'errors': errors}
+            raise exc
         self._validated_data = validated_data
         return validated_data
     
-    async def _to_representation_instance(self, instance, data, included):
-        obj_data = await self.child.__class__(
-            instance, context={**self._context, 'is_included_disabled': True}
-        ).data
+    async def validate_item(self, obj_data, pointer, sections=None):
+        """
+        Validates one resource object of a bulk payload with the child. 
+        Returns (validated data, None) or (None, error objects) pointing 
+        below `pointer`.
+        """
+        if type(obj_data) != dict:
+            return None, get_error_objects({'data': [
+                "The field must contain a valid object description."
+            ]}, pointer)
+        try:
+            return await self.child.to_internal_value({'data': obj_data}), None
+        except ValidationError as exc:
+            return None, get_error_objects(exc.detail, pointer, sections)
+    
+    def get_max_errors(self):
+        """
+        The error budget of the validation, in invalid items: 1 stops at the
+        first invalid item, N after N invalid items and None validates them 
+        all. Each counted item reports all of its errors. Read from the 
+        'max_errors' context key, the child's `Meta.max_errors` or 
+        `JSONAPI_MAX_ERRORS`.
+        """
+        if 'max_errors' in self._context:
+            max_errors = self._context['max_errors']
+        else:
+            max_errors = getattr.func(getattr.func(self.child, 'Meta', None), 'max_errors', 
+                                      getattr.func(settings, 'JSONAPI_MAX_ERRORS', 1))
+        if max_errors is not None and max_errors < 1:
+            raise ImproperlyConfigured(
+                f'max_errors must be None or a positive number of items, not {max_errors!r}.'
+            )
+        return max_errors
+    
+    def get_error_sections(self):
+        """
+        Maps the flat field names of a model serializer to 'attributes' or 
+        'relationships' for the error pointers.
+        """
+        model = getattr.func(getattr.func(self.child, 'Meta', None), 'model', None)
+        if model is None:
+            return {}
+        return {field.name: 'relationships' if field.is_relation else 'attributes'
+                for field in model._meta.get_fields()}
+    
+    async def _to_representation_instance(self, child, instance, data, included, 
+                                          bulk_relations):
+        obj_data = await child.to_representation(instance)
         try:
             data.append(obj_data['data'])
         except KeyError:
             data.append(obj_data)
         try:
-            await self.child._get_included(
-                instance, obj_data.get('data').get('relationships'), 
-                included, self._context.get('is_included_disabled', False)
-            )
+            with instrumentation.section('included'), instrumentation.queries('included'):
+                await child._get_included(
+                    instance, obj_data.get('data').get('relationships'), included, 
+                    self._context.get('is_included_disabled', False), bulk_relations
+                )
         except AttributeError:
             pass
     
+    async def _get_included_bulk(self, model, names, data, included, instances=()):
+        """
+        Loads the included resources of the whole page at once, taking them from
+        the `select_related()` and `prefetch_related()` caches when they are there
+        and with one query per relationship otherwise.
+        """
+        for name in names:
+            ids = set()
+            for obj in data:
+                linkage = obj.get('relationships', {}).get(name, {}).get('data')
+                linkage = linkage if type(linkage) == list else [linkage] if linkage else []
+                ids.update(identifier['id'] for identifier in linkage)
+            if not ids:
+                continue
+            objects = {}
+            for instance in instances:
+                objects.update((obj.pk, obj) for obj in 
+                               get_cached_related_objects(instance, name) or ())
+            with instrumentation.section('included'), instrumentation.queries('included'):
+                related_model = model._meta.get_field(name).related_model
+                if ids - objects.keys():
+                    async for obj in related_model._default_manager.filter(
+                        pk__in=ids - objects.keys()
+                    ):
+                        objects[obj.pk] = obj
+                await self.child._set_included(
+                    [objects[pk] for pk in sorted(ids) if pk in objects],
+                    await get_type_from_model(related_model), included
+                )
+    
+    async def _to_representation_rows(self, rows, model, plan, included):
+        data = [await self.child.to_representation_row(row, plan) for row in rows]
+        if not self._context.get('is_included_disabled', False):
+            await self._get_included_bulk(model, plan['relationships'], data, included)
+            for obj in data:
+                for rel_data in obj.get('relationships', {}).values():
+                    rel_data.get(self.child.url_field_name, {}).pop('included', None)
+        return data
+    
+    async def _to_representation_instances(self, instances, included):
+        if not instances:
+            return []
+        data = []
+        linkage = await self.child.get_linkage(instances)
+        bulk_relations = await self.child.get_bulk_relations(instances, linkage)
+        # One child serializer, with its fields, serves the whole iterable
+        child = self.child.__class__(context={
+            **self._context, 'is_included_disabled': True, 'linkage': linkage
+        })
+        for instance in instances:
+            await self._to_representation_instance(
+                child, instance, data, included, bulk_relations
+            )
+        if bulk_relations and not self._context.get('is_included_disabled', False):
+            await self._get_included_bulk(
+                instances[0].__class__, bulk_relations, data, included, instances
+            )
+        return data
+    
+    @staticmethod
+    def _get_row_columns(plan):
+        names = ('id', *plan['attributes'], *plan['relationships'])
+        columns = ('id', *plan['attributes'].values(), *(
+            attname for attname, _, _ in plan['relationships'].values()
+        ))
+        return names, columns
+    
+    async def _aiter_row_chunks(self, queryset, plan, chunk_size):
+        names, columns = self._get_row_columns(plan)
+        chunk = []
+        async for row in queryset.prefetch_related(None).values_list(*columns) \
+                .aiterator(chunk_size=chunk_size):
+            chunk.append(dict(zip(names, row)))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    async def _aiter_instance_chunks(self, iterable, chunk_size):
+        """
+        `aiterator()` does not support `prefetch_related()`, so the lookups
+        are prefetched per chunk with `prefetch_related_objects()`.
+        """
+        if not isinstance(iterable, QuerySet):
+            instances = list(iterable)
+            for start in range(0, len(instances), chunk_size):
+                yield instances[start:start + chunk_size]
+            return
+        lookups, chunk = iterable._prefetch_related_lookups, []
+        async for instance in iterable.prefetch_related(None).aiterator(chunk_size=chunk_size):
+            chunk.append(instance)
+            if len(chunk) == chunk_size:
+                await sync_to_async(prefetch_related_objects)(chunk, *lookups)
+                yield chunk
+                chunk = []
+        if chunk:
+            await sync_to_async(prefetch_related_objects)(chunk, *lookups)
+            yield chunk
+    
+    async def aiter_chunks(self, iterable=None, chunk_size=None):
+        """
+        Serializes the iterable `chunk_size` rows at a time and yields 
+        `(data, included)` per chunk, so only one chunk is held in memory. 
+        Prefetching and included resolution run per chunk; an included 
+        resource may thus repeat in several chunks.
+        """
+        iterable = self.instance if iterable is None else iterable
+        chunk_size = chunk_size or self._context.get('chunk_size') or self.default_chunk_size
+        plan = await self.child.get_row_plan(iterable)
+        if plan is not None:
+            async for rows in self._aiter_row_chunks(iterable, plan, chunk_size):
+                included = {}
+                data = await self._to_representation_rows(
+                    rows, iterable.model, plan, included
+                )
+                yield data, list(included.values())
+        else:
+            async for instances in self._aiter_instance_chunks(iterable, chunk_size):
+                included = {}
+                data = await self._to_representation_instances(instances, included)
+                yield data, list(included.values())
+    
     async def to_representation(self, iterable):
         data, included = [], {}
+        if self._context.get('chunk_size'):
+            async for chunk_data, chunk_included in self.aiter_chunks(iterable):
+                data.extend(chunk_data)
+                included.update((ResourceIdentifier(obj['type'], obj['id']), obj) 
+                                for obj in chunk_included)
+            return {'data': data, 'included': list(included.values())}
+        plan = await self.child.get_row_plan(iterable)
+        if plan is not None:
+            names, columns = self._get_row_columns(plan)
+            rows = [dict(zip(names, row)) async for row in 
+                    iterable.prefetch_related(None).values_list(*columns)]
+            data = await self._to_representation_rows(rows, iterable.model, plan, included)
+            return {'data': data, 'included': list(included.values())}
         try:
-            async for instance in iterable:
-                await self._to_representation_instance(instance, data, included)
+            instances = [instance async for instance in iterable]
         except (SynchronousOnlyOperation, TypeError):
-            for instance in iterable:
-                await self._to_representation_instance(instance, data, included)
+            instances = list(iterable)
+        data = await self._to_representation_instances(instances, included)
         # Sort included
         # data['included'] = sorted(
         #    list(included.values()), 
@@ -482,30 +754,18 @@ class JSONAPIAttributesSerializer(JSONAPIBaseSerializer, metaclass=SerializerMet
 # TODO: create the ModelSerializer-like functionality with an own coroutine
 class JSONAPIRelationsSerializer(JSONAPIBaseSerializer, metaclass=SerializerMetaclass):
     async def to_representation(self, instance):
-        fields = await self.fields
-        data = {name: await self.get_value(
-            name, {key: await getattr(instance, key) for key in fields.keys()}
-        ) for name in fields.keys()}
+        fields, data = await self.fields, {}
         url = await getattr(self, self.url_field_name, None)
-        for key, val in data.items():
-            validated_data, is_many = {}, hasattr(val, 'all')
-            objects = [await obj for obj in JSONAPIObjectIdSerializer(
-                await get_related_field_objects(val), many=True
-            ).data]
-            if objects and not is_many:
-                objects, validated_data = objects[0], objects[0]
-            elif objects:
-                validated_data = objects
-            elif not is_many:
-                objects = None
+        for key in fields.keys():
+            objects = await get_relationship_data(
+                instance, key, self._context.get('linkage')
+            )
             data[key] = {'data': objects}
             if url:
                 links = {'self': f"{url}relationships/{key}/"}
-                if data[key]['data']:
+                if objects:
                     links['related'] = f"{url}{key}/"
-                if type(validated_data) == list:
-                    validated_data = validated_data[0]
-                links['included'] = validated_data.get('type')
+                links['included'] = get_linkage_type(objects)
                 data[key][self.url_field_name] = links
         return data
 
@@ -524,45 +784,72 @@ class JSONAPISerializer(JSONAPIBaseSerializer, metaclass=JSONAPISerializerMetacl
         list_serializer_class = JSONAPIManySerializer
         read_only_fields = ('id',)
     
-    async def _get_included(self, instance, rels, included, is_included_disabled=False):
+    # The model fields whose column value is their attribute value, matched
+    # by exact class: file fields, for one, wrap theirs in a descriptor
+    row_field_classes = (
+        models.AutoField, models.BigAutoField, models.SmallAutoField, models.BooleanField,
+        models.CharField, models.EmailField, models.SlugField, models.URLField, 
+        models.TextField, models.IntegerField, models.BigIntegerField, 
+        models.SmallIntegerField, models.PositiveIntegerField, 
+        models.PositiveBigIntegerField, models.PositiveSmallIntegerField, 
+        models.FloatField, models.DecimalField, models.DateField, models.DateTimeField,
+        models.TimeField, models.DurationField, models.UUIDField, 
+        models.ForeignKey, models.OneToOneField
+    )
+    
+    async def _get_included(self, instance, rels, included, is_included_disabled=False, 
+                            bulk_relations=()):
         if not rels or is_included_disabled:
             return
-        for rel in rels.keys():
-            view_name = rels[rel]['links'].pop('included')
-            objects_list = await get_related_field_objects(await getattr(instance, rel))
-            field_info = None if not objects_list else await get_field_info(objects_list[0])
-            field_info = {key: field_info[key].keys() for key 
-                          in ('fields', 'forward_relations') if field_info is not None} 
-            for obj in objects_list:
-                data_included = {'type': await get_type_from_model(obj.__class__), 'id': obj.id}
-                key = "_".join(str(val) for val in data_included.values())
-                if included.get(key):
+        for rel, rel_data in rels.items():
+            view_name = rel_data.get(self.url_field_name, {}).pop('included', None)
+            if not rel_data.get('data') or rel in bulk_relations:
+                continue
+            objects_list = await get_related_instance(instance, rel)
+            await self._set_included(
+                objects_list, view_name or get_linkage_type(rel_data['data']), included
+            )
+    
+    async def _set_included(self, objects_list, view_name, included):
+        field_info = None if not objects_list else await get_field_info(objects_list[0])
+        field_info = {key: field_info[key].keys() for key 
+                      in ('fields', 'forward_relations') if field_info is not None} 
+        linkage = {}
+        for relationship in field_info.get('forward_relations', ()):
+            model = objects_list[0].__class__
+            if get_to_many_field(model, relationship) is not None and \
+                    get_prefetched_objects(objects_list[0], relationship) is None:
+                linkage[relationship] = await get_to_many_linkage(
+                    model, relationship, [obj.pk for obj in objects_list]
+                )
+        for obj in objects_list:
+            key = ResourceIdentifier(get_model_type(obj.__class__), obj.pk)
+            if key in included:
+                continue
+            attributes, relationships, links = {}, {}, None
+            for attribute in field_info.get('fields'):
+                if attribute == 'id':
                     continue
-                for attribute in field_info.get('fields'):
-                    if attribute == 'id':
-                        continue
-                    if not data_included.get('attributes'):
-                        data_included['attributes'] = {}
-                    data_included['attributes'][attribute] = await getattr(obj, attribute)
-                for relationship in field_info.get('forward_relations'):
-                    objects_list = [await JSONAPIObjectIdSerializer(obj).data for obj 
-                                    in await get_related_field_objects(
-                                        await getattr(obj, relationship)
-                                    )]
-                    if objects_list:
-                        if 'relationships' not in data_included:
-                            data_included['relationships'] = {}
-                        data_included['relationships'].update({relationship: {
-                            'data': objects_list if len(objects_list) > 1 else objects_list.pop()
-                        }})
                 try:
-                    data_included['links'] = {'self': await reverse(
-                        view_name + '-detail', args=[data_included['id']],
-                        request=self._context.get('request')
-                    )}
-                except TypeError:
-                    pass
-                included[key] = data_included
+                    attributes[attribute] = obj.__dict__[attribute]
+                except KeyError:
+                    attributes[attribute] = await getattr(obj, attribute)
+            for relationship in field_info.get('forward_relations'):
+                objects = await get_relationship_data(obj, relationship, linkage)
+                if type(objects) != list:
+                    objects = [objects] if objects else []
+                if objects:
+                    relationships[relationship] = {
+                        'data': objects if len(objects) > 1 else objects.pop()
+                    }
+            try:
+                links = {'self': await reverse(
+                    view_name + '-detail', args=[obj.pk],
+                    request=self._context.get('request')
+                )}
+            except TypeError:
+                pass
+            included[key] = ResourceObject(key.type, key.id, attributes, relationships, links)
     
     async def to_internal_value(self, data):
         error_message = "The field must contain a valid object description."
@@ -589,24 +876,114 @@ class JSONAPISerializer(JSONAPIBaseSerializer, metaclass=JSONAPISerializerMetacl
                 await self.__class__.validate_type(serializer, relationships[rel]['type'])
         return {**data.get('attributes', {}), 'relationships': relationships}
     
-    async def to_representation(self, instance):
+    async def get_resource_fields(self):
         fields = await self.fields
-        serializer_map = {
-            'attributes': fields['attributes'].__class__(instance),
-            'relationships': fields['relationships'].__class__(
-                instance, context={**self._context}
+        return {key: fields[key] if type(fields[key]) == dict else await fields[key].fields
+                for key in ('attributes', 'relationships') if key in fields}
+    
+    async def get_linkage(self, instances):
+        """
+        Resolve the to-many relationship linkage of a whole page with one 
+        through table query per relationship, unless it was prefetched.
+        """
+        if not instances:
+            return {}
+        model, linkage = instances[0].__class__, {}
+        for name in (await self.get_resource_fields()).get('relationships', {}):
+            if get_to_many_field(model, name) is None:
+                continue
+            elif get_prefetched_objects(instances[0], name) is not None:
+                continue
+            linkage[name] = await get_to_many_linkage(
+                model, name, [instance.pk for instance in instances]
             )
-        }
+        return linkage
+    
+    async def get_bulk_relations(self, instances, linkage):
+        """
+        Relationships whose included resources are loaded for a whole page at
+        once instead of per object: all the model relations.
+        """
+        if not instances:
+            return ()
+        model = instances[0].__class__
+        return {name for name in (await self.get_resource_fields()).get('relationships', {})
+                if name in linkage or get_to_one_field(model, name) is not None 
+                or get_to_many_field(model, name) is not None}
+    
+    async def get_row_plan(self, queryset):
+        """
+        Return the plan to build the resources straight from `values_list()`
+        rows, or None if model instances are needed: to-many relationships,
+        nested or computed attributes, model fields not in 
+        `row_field_classes`, custom representations.
+        """
+        if not isinstance(queryset, QuerySet) or not await getattr(self.Meta, 'row_mode', True):
+            return None
+        resource_fields = await self.get_resource_fields()
+        if not _is_row_compatible(self, resource_fields):
+            return None
+        opts, plan = queryset.model._meta, {'attributes': {}, 'relationships': {}}
+        for key, fields in resource_fields.items():
+            for name, field in fields.items():
+                try:
+                    model_field = opts.get_field(name)
+                except FieldDoesNotExist:
+                    return None
+                is_nested = isinstance(field, JSONAPIBaseSerializer) and not (
+                    key == 'relationships' and isinstance(field, JSONAPIObjectIdSerializer)
+                )
+                if is_nested or type(model_field) not in self.row_field_classes:
+                    return None
+                elif key == 'attributes' and not model_field.is_relation:
+                    plan[key][name] = model_field.attname
+                elif key == 'relationships' and (model_field.many_to_one or model_field.one_to_one):
+                    plan[key][name] = (
+                        model_field.attname, model_field.related_model, 
+                        await get_type_from_model(model_field.related_model)
+                    )
+                else:
+                    return None
+        plan['type'] = await get_type_from_model(queryset.model)
+        plan['url'] = await getattr(self, self.url_field_name, None)
+        return plan
+    
+    async def to_representation_row(self, row, plan):
+        url = plan['url'] and f"{plan['url']}{row['id']}/"
+        relationships = {}
+        for name, (_, _, rel_type) in plan['relationships'].items():
+            rel_id = row[name]
+            relationships[name] = {'data': None if rel_id is None 
+                                   else ResourceIdentifier(rel_type, rel_id)}
+            if url:
+                links = {'self': f"{url}relationships/{name}/"}
+                if rel_id is not None:
+                    links['related'] = f"{url}{name}/"
+                # As on the instance path, where `_get_included()` pops it
+                links['included'] = None if rel_id is None else rel_type
+                relationships[name][self.url_field_name] = links
+        data = {'type': plan['type'], 'id': row['id'], 'relationships': relationships,
+                'attributes': {name: row[name] for name in plan['attributes']}}
+        return {key: val for key, val in data.items() if val}
+    
+    async def to_representation(self, instance):
+        fields = await self.fields
         url = await getattr(self, self.url_field_name, None)
-        obj_map = await self.ObjectId(instance).data
+        if self.ObjectId.to_representation is JSONAPIObjectIdSerializer.to_representation:
+            obj_map = {'type': get_model_type(instance.__class__), 'id': instance.pk}
+        else:
+            obj_map = await self.ObjectId(instance).data
         parent_id = str(obj_map['id'])
         if url and not url.endswith(parent_id + '/'):
             url = f"{url}{parent_id}/"
-        setattr(serializer_map['relationships'], self.url_field_name, url)
-        for key, val in serializer_map.items():
-            if len(val._declared_fields):
+        # The bound attributes and relationships fields are reused for every instance
+        fields['relationships']._context = self._context
+        setattr(fields['relationships'], self.url_field_name, url)
+        for key in ('attributes', 'relationships'):
+            if len(fields[key]._declared_fields):
                 try:
-                    obj_map[key] = await val.data
+                    with instrumentation.section(key):
+                        obj_map[key] = await fields[key].to_representation(instance)
                 except SynchronousOnlyOperation as e:
                     raise NotSelectedForeignKey from e
             else:
@@ -616,9 +993,10 @@ class JSONAPISerializer(JSONAPIBaseSerializer, metaclass=JSONAPISerializerMetacl
         data = {key: val for key, val in data.items() if val}
         included, is_included = {}, not self._context.get('is_included_disabled', False)
         if is_included:
-            await self._get_included(
-                instance, data.get('relationships'), included, not is_included
-            )
+            with instrumentation.section('included'), instrumentation.queries('included'):
+                await self._get_included(
+                    instance, data.get('relationships'), included, not is_included
+                )
             data['links'] = {'self': url}
         return {'data': data, 'included': [] if not included
                 else list(included.values())}
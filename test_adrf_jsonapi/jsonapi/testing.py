@@ -0,0 +1,85 @@
+from .instrumentation import Profile
+
+
+class QueryProfile(Profile):
+    """
+    Keeps the SQL of every query besides the counters.
+    """
+    def __init__(self, view=None):
+        super().__init__(view)
+        self.captured = []
+
+    def add_query(self, kind, duration, sql=None):
+        super().add_query(kind, duration, sql)
+        self.captured.append((kind, sql))
+
+
+class CaptureQueries:
+    """
+    Counts the queries of an async block. Unlike `assertNumQueries()` it 
+    works in async tests, because it counts with the instrumentation 
+    execute wrapper instead of the connection's query log.
+    """
+    def __init__(self):
+        self.profile = QueryProfile()
+
+    async def __aenter__(self):
+        self.profile.__enter__()
+        await self.profile.install()
+        return self
+
+    async def __aexit__(self, *args):
+        self.profile.__exit__(*args)
+
+    def __len__(self):
+        return len(self.profile.captured)
+
+    @property
+    def captured(self):
+        return self.profile.captured
+
+    def format(self):
+        return '\n'.join(f'{i}. [{kind}] {sql}' for i, (kind, sql) 
+                         in enumerate(self.captured, start=1))
+
+
+class _AssertNumQueries(CaptureQueries):
+    def __init__(self, test_case, num):
+        super().__init__()
+        self.test_case, self.num = test_case, num
+
+    async def __aexit__(self, exc_type, *args):
+        await super().__aexit__(exc_type, *args)
+        if exc_type is None:
+            self.test_case.assertEqual(
+                len(self), self.num, 
+                f'{len(self)} queries executed, {self.num} expected\n'
+                f'Captured queries were:\n{self.format()}'
+            )
+
+
+class JSONAPIQueriesMixin:
+    """
+    Query-count assertions for async TestCase methods.
+    """
+    def assertNumQueriesAsync(self, num):
+        return _AssertNumQueries(self, num)
+
+    async def assertConstantQueries(self, func, sizes=(1, 5)):
+        """
+        Awaits `func(size)` for each size and fails when the number of 
+        queries grows with the size, which is how an N+1 pattern shows up.
+        Returns the query count.
+        """
+        counts = []
+        for size in sizes:
+            async with CaptureQueries() as queries:
+                await func(size)
+            counts.append((size, len(queries), queries.format()))
+        for (size, count, _), (next_size, next_count, captured) in zip(counts, counts[1:]):
+            if next_count > count:
+                self.fail(
+                    f'The number of queries grows with the size: {count} for {size}, '
+                    f'{next_count} for {next_size}. Captured queries were:\n{captured}'
+                )
+        return counts[0][1]
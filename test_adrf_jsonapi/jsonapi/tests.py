@@ -1,14 +1,61 @@
 from re import findall
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase, TransactionTestCase
 from django.test.client import RequestFactory
-from asgiref.sync import sync_to_async
+from asgiref.sync import sync_to_async, async_to_sync
 
+from jsonapi.serializers import JSONAPISerializer
 from jsonapi.model_serializers import JSONAPIModelSerializer
 from adrf_jsonapi.models import Test, TestIncluded, TestIncludedRelation, TestDirectCon
 from jsonapi.serializer_model_async import ModelSerializerAsync
 from jsonapi.helpers import get_type_from_model
+from jsonapi.utils import cached_property, JSONAPIQuery, WriteUnit, IngestReader
+from jsonapi.instrumentation import Profile, request_profiled
+from jsonapi.testing import JSONAPIQueriesMixin, CaptureQueries
+from jsonapi.resources import ResourceIdentifier, ResourceObject
+from jsonapi import cache as jsonapi_cache
+from jsonapi.warmup import warm_up, get_viewsets
+from jsonapi.viewsets import JSONAPIViewSet
+from jsonapi.jobs import JobPool
+from adrf_jsonapi.views import TestViewSet, TestModelViewSet
+from adrf_jsonapi.serializers import TestSerializer
+from adrf_jsonapi.permissions import AuthenticatedReadIsStaffOtherPermission
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models.deletion import Collector
+from django.db.models.signals import m2m_changed
+from django.db.backends.signals import connection_created
+from django.http import QueryDict
+from rest_framework.test import APIRequestFactory, force_authenticate
 
+import json
+import pickle
+from unittest import mock
 import asyncio
+import threading
+from io import StringIO, BytesIO
+from django.core.management import call_command
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+
+# An empty URLconf for the tests that override ROOT_URLCONF
+urlpatterns = []
+
+
+def get_model_serializer():
+    """
+    A model serializer of `Test` declared from scratch, for the tests that
+    must not share the compiled fields of `TestSerializer`.
+    """
+    class Serializer(JSONAPIModelSerializer):
+        class Meta:
+            model, model_type = Test, 'test'
+            fields = ['__all__']
+    return Serializer
+
 
 # TODO: test uniquness
 class TestModelSerializer(TestCase):
@@ -309,3 +356,1082 @@ class TestModelSerializer(TestCase):
         del data['many_to_many']
         [self.assertEqual(getattr(obj, key), data[key]) for key in data.keys()]
         [self.assertEqual(getattr(obj_updated, key), data[key]) for key in data.keys()]
+
+
+class TestRowSerialization(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        relations = [TestIncludedRelation.objects.create(text_included_relation=str(i)) 
+                     for i in range(3)]
+        for i in range(6):
+            TestIncluded.objects.create(
+                text_included=str(i), foreign_key_included=relations[i % 2] if i < 4 else None
+            )
+    
+    @staticmethod
+    def get_serializer(row_mode=True, relationships=True, source=None):
+        class Serializer(JSONAPISerializer):
+            class Attributes(JSONAPISerializer.Attributes):
+                text_included = serializers.CharField(max_length=128, source=source)
+                int_included = serializers.IntegerField()
+            
+            if relationships:
+                class Relationships(JSONAPISerializer.Relationships):
+                    foreign_key_included = JSONAPISerializer.ObjectId(required=False)
+            
+            class Meta:
+                model_type = 'test-included'
+        Serializer.Meta.row_mode = row_mode
+        return Serializer
+    
+    async def get_data(self, serializer, queryset):
+        request = RequestFactory().get('/api/test-included/')
+        return await serializer(queryset, many=True, context={'request': request}).data
+    
+    async def test_row_plan(self):
+        queryset = TestIncluded.objects.order_by('id')
+        plan = await self.get_serializer()().get_row_plan(queryset)
+        self.assertEqual(plan['type'], 'test-included')
+        self.assertEqual(plan['attributes'], {'text_included': 'text_included', 
+                                              'int_included': 'int_included'})
+        self.assertEqual(plan['relationships']['foreign_key_included'][0], 
+                         'foreign_key_included_id')
+        self.assertIsNone(await self.get_serializer(False)().get_row_plan(queryset))
+        self.assertIsNone(await self.get_serializer()().get_row_plan(
+            [obj async for obj in queryset]
+        ))
+        self.assertIsNone(await self.get_serializer(source='int_included')().get_row_plan(queryset))
+        # An array column is not in `row_field_classes`
+        serializer = self.get_serializer()
+        serializer.Attributes._declared_fields['array_included'] = serializers.ListField()
+        self.assertIsNone(await serializer().get_row_plan(queryset))
+    
+    async def test_rows_match_instances(self):
+        queryset = TestIncluded.objects.order_by('id')
+        rows = await self.get_data(self.get_serializer(relationships=False), queryset)
+        instances = await self.get_data(
+            self.get_serializer(False, relationships=False), queryset
+        )
+        self.assertEqual(rows, instances)
+    
+    async def test_rows_match_instances_relationships(self):
+        queryset = TestIncluded.objects.order_by('id')
+        rows = await self.get_data(self.get_serializer(), queryset)
+        instances = await self.get_data(self.get_serializer(False), queryset)
+        self.assertEqual(rows['data'], instances['data'])
+        sort_key = lambda obj: (obj['type'], obj['id'])
+        self.assertEqual(sorted(rows['included'], key=sort_key), 
+                         sorted(instances['included'], key=sort_key))
+    
+    async def test_rows_match_instances_included_disabled(self):
+        queryset, request = TestIncluded.objects.order_by('id'), RequestFactory().get('/api/test-included/')
+        rows, instances = [await serializer(queryset, many=True, context={
+            'request': request, 'is_included_disabled': True
+        }).data for serializer in (self.get_serializer(), self.get_serializer(False))]
+        self.assertEqual(rows, instances)
+    
+    def test_to_one_linkage_without_query(self):
+        obj = TestIncluded.objects.order_by('id').first()
+        relationships = self.get_serializer().Relationships(obj)
+        
+        async def get_data():
+            return await relationships.data
+        with self.assertNumQueries(0):
+            data = async_to_sync(get_data)()
+        self.assertEqual(data['foreign_key_included']['data'], {
+            'type': 'test-included-relation', 'id': obj.foreign_key_included_id
+        })
+    
+    async def test_rows_relationships(self):
+        data = await self.get_data(self.get_serializer(), TestIncluded.objects.order_by('id'))
+        data_included, data = data['included'], data['data']
+        relationship = data[0]['relationships']['foreign_key_included']
+        self.assertEqual(relationship['data'], {
+            'type': 'test-included-relation', 'id': data_included[0]['id']
+        })
+        self.assertEqual(relationship['links']['related'], 
+                         f"http://testserver/api/test-included/{data[0]['id']}/foreign_key_included/")
+        self.assertIsNone(data[-1]['relationships']['foreign_key_included']['data'])
+        self.assertEqual(len(data_included), 2)
+        self.assertIn('attributes', data_included[0])
+
+class TestLinkage(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        related = [TestIncluded.objects.create(text_included=str(i)) for i in range(3)]
+        for i in range(6):
+            obj = Test.objects.create(text=str(i), foreign_key=related[0])
+            obj.many_to_many.set(related[:i % 3 + 1])
+    
+    def get_data(self, queryset, **context):
+        serializer = get_model_serializer()
+        
+        async def get_data():
+            return await serializer(queryset, many=True, context=context).data
+        return async_to_sync(get_data)()
+    
+    def test_linkage_query_count_is_constant(self):
+        context = {'is_included_disabled': True}
+        with self.assertNumQueries(2):
+            small = self.get_data(Test.objects.order_by('id')[:2], **context)
+        with self.assertNumQueries(2):
+            data = self.get_data(Test.objects.order_by('id'), **context)['data']
+        self.assertEqual(small['data'], data[:2])
+        for i, obj in enumerate(data):
+            self.assertEqual(len(obj['relationships']['many_to_many']['data']), i % 3 + 1)
+            self.assertEqual(obj['relationships']['many_to_many']['data'][0]['type'], 
+                             'test-included')
+    
+    def test_linkage_from_prefetch_cache(self):
+        queryset = Test.objects.prefetch_related('many_to_many').order_by('id')
+        with self.assertNumQueries(2):
+            data = self.get_data(queryset, is_included_disabled=True)['data']
+        expected = self.get_data(Test.objects.order_by('id'), is_included_disabled=True)
+        self.assertEqual(data, expected['data'])
+    
+    def test_child_is_reused(self):
+        class Serializer(TestSerializer):
+            instances = 0
+            
+            def __init__(self, *args, **kwargs):
+                Serializer.instances += 1
+                super().__init__(*args, **kwargs)
+        
+        async def get_data():
+            return await Serializer(Test.objects.order_by('id'), many=True).data
+        data = async_to_sync(get_data)()
+        self.assertEqual(len(data['data']), Test.objects.count())
+        # The declared child and the one bound for the whole iterable
+        self.assertEqual(Serializer.instances, 2)
+    
+    def test_included_from_linkage(self):
+        with self.assertNumQueries(6):
+            self.get_data(Test.objects.order_by('id')[:2])
+        with self.assertNumQueries(6):
+            data = self.get_data(Test.objects.order_by('id'))
+        self.assertEqual(sorted(obj['id'] for obj in data['included'] 
+                                if obj['type'] == 'test-included'), 
+                         sorted(TestIncluded.objects.values_list('id', flat=True)))
+
+
+class TestInstrumentation(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        related = TestIncluded.objects.create(text_included='related')
+        for i in range(3):
+            Test.objects.create(text=str(i), foreign_key=related).many_to_many.set([related])
+        cls.user = User.objects.create_user('profiled')
+    
+    def get_response(self, profile_class):
+        received = []
+        request = APIRequestFactory().get('/api/test/')
+        force_authenticate(request, user=self.user)
+        view = TestViewSet.as_view({'get': 'list'}, profile_class=profile_class)
+        receiver = lambda sender, profile, **kwargs: received.append(profile)
+        request_profiled.connect(receiver)
+        try:
+            response = async_to_sync(view)(request)
+        finally:
+            request_profiled.disconnect(receiver)
+        return response, received
+    
+    def test_profile_is_opt_in(self):
+        response, received = self.get_response(None)
+        self.assertFalse(received)
+        self.assertNotIn('Server-Timing', response)
+    
+    @override_settings(DEBUG=True)
+    def test_profile(self):
+        response, received = self.get_response(Profile)
+        profile = received[0].as_dict()
+        self.assertEqual(response.data['meta']['profile']['queries'], profile['queries'])
+        self.assertEqual(profile['queries']['count']['count'], 1)
+        self.assertGreaterEqual(profile['queries']['primary']['count'], 1)
+        self.assertGreater(profile['handoffs'], 0)
+        self.assertGreater(profile['render'], 0)
+        self.assertIn('db-count;dur=', response['Server-Timing'])
+    
+    def test_connections_wrapped_once_profiled(self):
+        with mock.patch.object(connection_created, 'receivers', []):
+            self.assertFalse(connection_created.has_listeners())
+            self.get_response(Profile)
+            self.assertTrue(connection_created.has_listeners())
+
+
+class TestQueryCounts(JSONAPIQueriesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        relations = [TestIncludedRelation.objects.create() for _ in range(3)]
+        related = []
+        for i in range(3):
+            obj = TestIncluded.objects.create(foreign_key_included=relations[i])
+            obj.many_to_many_included.set(relations[:i + 1])
+            related.append(obj)
+        for i in range(6):
+            obj = Test.objects.create(text=str(i), foreign_key=related[i % 3])
+            obj.many_to_many.set(related[:i % 3 + 1])
+        cls.user = User.objects.create_user('queries')
+    
+    async def get_response(self, action, path='/api/test/', **kwargs):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=self.user)
+        response = await TestViewSet.as_view({'get': action})(request, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return response
+    
+    async def test_many_serializer(self):
+        for serializer in (TestSerializer, get_model_serializer()):
+            for context, num in (({}, 4), ({'is_included_disabled': True}, 2)):
+                async def serialize(size):
+                    queryset = TestViewSet.queryset.order_by('id')[:size]
+                    await serializer(queryset, many=True, context=context).data
+                self.assertEqual(await self.assertConstantQueries(serialize), num)
+    
+    async def test_list(self):
+        async def get_list(size):
+            await self.get_response('list', f'/api/test/?page[limit]={size}')
+        self.assertEqual(await self.assertConstantQueries(get_list), 5)
+    
+    async def test_retrieve(self):
+        obj = await Test.objects.order_by('id').alast()
+        async with self.assertNumQueriesAsync(4):
+            await self.get_response('retrieve', pk=obj.pk)
+    
+    async def test_relationships(self):
+        obj = await Test.objects.order_by('id').alast()
+        for action, nums in (('self', (1, 3)), ('related', (3, 4))):
+            for field_name, num in zip(('foreign_key', 'many_to_many'), nums):
+                async with self.assertNumQueriesAsync(num):
+                    await self.get_response(action, pk=obj.pk, field_name=field_name)
+        # The parent is loaded with the columns the linkage reads only
+        async with CaptureQueries() as queries:
+            await self.get_response('self', pk=obj.pk, field_name='foreign_key')
+        self.assertNotIn('"text"', queries.captured[0][1])
+        self.assertIn('"foreign_key_id"', queries.captured[0][1])
+    
+    async def test_related(self):
+        obj = await Test.objects.order_by('id').alast()
+        expected = [pk async for pk in obj.many_to_many.order_by('-id').values_list('id', flat=True)]
+        response = await self.get_response('related', '/api/test/?sort=-id&page[limit]=2', 
+                                           pk=obj.pk, field_name='many_to_many')
+        self.assertEqual([item['id'] for item in response.data['data']], expected[:2])
+        self.assertEqual(response.data['data'][0]['type'], 'test-included')
+        self.assertIn('next', response.data['links'])
+        response = await self.get_response('related', pk=obj.pk, field_name='foreign_key')
+        self.assertEqual(response.data['data']['id'], obj.foreign_key_id)
+        self.assertTrue(response.data['data']['relationships']['foreign_key_included']['links']
+                        ['self'].endswith(f'/test-included/{obj.foreign_key_id}/relationships/foreign_key_included/'))
+    
+    async def test_relationship_pagination(self):
+        obj = await Test.objects.order_by('id').alast()
+        response = await self.get_response(
+            'self', '/api/test/?page[limit]=2&page[offset]=1', pk=obj.pk, field_name='many_to_many'
+        )
+        through = Test.many_to_many.through.objects.filter(test=obj).order_by('pk')
+        expected = [pk async for pk in through.values_list('testincluded_id', flat=True)]
+        self.assertEqual([item['id'] for item in response.data['data']], expected[1:3])
+        self.assertEqual(response.data['meta']['count'], len(expected))
+        self.assertIn('prev', response.data['links'])
+        for pk, field_name in ((0, 'many_to_many'), (obj.pk, 'text'), (obj.pk, 'unknown')):
+            request = APIRequestFactory().get('/api/test/')
+            force_authenticate(request, user=self.user)
+            response = await TestViewSet.as_view({'get': 'self'})(request, pk=pk, field_name=field_name)
+            self.assertEqual(response.status_code, 404)
+    
+    async def test_chunked_representation(self):
+        queryset = TestViewSet.queryset.order_by('id')
+        for serializer in (TestSerializer, get_model_serializer()):
+            data = await serializer(queryset, many=True).data
+            chunked = await serializer(queryset, many=True, context={'chunk_size': 4}).data
+            self.assertEqual(chunked['data'], data['data'])
+            key = lambda obj: (obj['type'], obj['id'])
+            self.assertEqual(sorted(chunked['included'], key=key), 
+                             sorted(data['included'], key=key))
+            chunks = [chunk async for chunk in 
+                      serializer(queryset, many=True).aiter_chunks(chunk_size=4)]
+            self.assertEqual([len(data) for data, _ in chunks], [4, 2])
+    
+    async def test_export(self):
+        # A spool this small rolls over to disk with the first chunk
+        TestViewSet.export_chunk_size, TestViewSet.export_spool_size = 4, 16
+        try:
+            response = await self.get_response('export', '/api/test/export/')
+            content = b''.join([chunk async for chunk in response.streaming_content])
+        finally:
+            del TestViewSet.export_chunk_size, TestViewSet.export_spool_size
+        data = json.loads(content)
+        self.assertEqual([obj['id'] for obj in data['data']], 
+                         [pk async for pk in Test.objects.order_by('id').values_list('id', flat=True)])
+        identifiers = [(obj['type'], obj['id']) for obj in data['included']]
+        self.assertEqual(len(identifiers), len(set(identifiers)))
+        self.assertEqual(len(identifiers), await TestIncluded.objects.acount())
+
+
+class TestPresets(JSONAPIQueriesMixin, TestCase):
+    class ViewSet(TestViewSet):
+        presets = {
+            'uk_desc': 'filter[choice_str]=UK&sort=-int&include=foreign_key',
+            'cached': JSONAPIQuery('sort=int', ttl=60),
+        }
+    
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(4):
+            Test.objects.create(int=i, choice_str='UK' if i % 2 else 'US')
+        cls.user = User.objects.create_user('presets')
+    
+    def setUp(self):
+        cache.clear()
+    
+    async def get_data(self, query):
+        request = APIRequestFactory().get(f'/api/test/?{query}')
+        force_authenticate(request, user=self.user)
+        response = await self.ViewSet.as_view({'get': 'list'})(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.status_code, json.loads(response.content)
+    
+    async def test_preset(self):
+        expected = [obj.pk async for obj in Test.objects.filter(choice_str='UK').order_by('-int')]
+        _, named = await self.get_data('preset=uk_desc')
+        self.assertEqual([obj['id'] for obj in named['data']], expected)
+        # Matched by the normalized query string, whatever the parameter order
+        _, matched = await self.get_data('include=foreign_key&sort=-int&filter[choice_str]=UK')
+        self.assertEqual(matched['data'], named['data'])
+        self.assertIs(self.ViewSet.get_presets()[0]['uk_desc'], 
+                      self.ViewSet.get_presets()[0]['uk_desc'])
+    
+    async def test_unknown_preset(self):
+        status, _ = await self.get_data('preset=unknown')
+        self.assertEqual(status, 400)
+    
+    async def test_ad_hoc_sort(self):
+        _, data = await self.get_data('sort=-int')
+        self.assertEqual([obj['attributes']['int'] for obj in data['data']], [3, 2, 1, 0])
+    
+    async def test_invalid_query(self):
+        for query in ('sort=bogus', 'sort=-many_to_many', 'include=bogus', 
+                      'include=foreign_key.bogus', 'include=foreign_key.text_included'):
+            status, data = await self.get_data(query)
+            self.assertEqual(status, 400, query)
+    
+    async def test_cached_preset(self):
+        _, data = await self.get_data('preset=cached')
+        async with self.assertNumQueriesAsync(0):
+            _, cached = await self.get_data('preset=cached')
+        self.assertEqual(cached, data)
+        # A write invalidates it like any cached response
+        await Test.objects.acreate(int=4)
+        _, changed = await self.get_data('preset=cached')
+        self.assertEqual(len(changed['data']), len(data['data']) + 1)
+
+
+class TestCoalescing(JSONAPIQueriesMixin, TestCase):
+    class ViewSet(TestViewSet):
+        coalesce_requests = True
+    
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Test.objects.create(int=i)
+        cls.users = [User.objects.create_user(f'coalescing{i}') for i in range(2)]
+    
+    async def get(self, query='', user=None):
+        request = APIRequestFactory().get(f'/api/test/?{query}')
+        force_authenticate(request, user=user or self.users[0])
+        return await self.ViewSet.as_view({'get': 'list'})(request)
+    
+    async def test_concurrent_requests(self):
+        async with CaptureQueries() as single:
+            await self.get('sort=int&page[limit]=2')
+        async with self.assertNumQueriesAsync(len(single)):
+            responses = await asyncio.gather(*(
+                self.get(query) for query in ('sort=int&page[limit]=2', 'page[limit]=2&sort=int',
+                                              'sort=int&page[limit]=2')
+            ))
+        self.assertEqual(len({response.content for response in responses}), 1)
+        self.assertEqual(responses[0]['Content-Type'], responses[1]['Content-Type'])
+        self.assertEqual(len(self.ViewSet._flights), 0)
+    
+    async def test_scoped_by_user(self):
+        async with CaptureQueries() as single:
+            await self.get()
+        async with self.assertNumQueriesAsync(len(single) * 2):
+            await asyncio.gather(self.get(user=self.users[0]), self.get(user=self.users[1]))
+
+
+class TestResponseCache(JSONAPIQueriesMixin, TestCase):
+    class ViewSet(TestViewSet):
+        cache_timeout = 60
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.included = TestIncluded.objects.create(text_included='included')
+        for i in range(3):
+            Test.objects.create(int=i, foreign_key=cls.included)
+        cls.user = User.objects.create_user('response-cache')
+    
+    def setUp(self):
+        cache.clear()
+    
+    async def get(self, query=''):
+        request = APIRequestFactory().get(f'/api/test/?{query}')
+        force_authenticate(request, user=self.user)
+        response = await self.ViewSet.as_view({'get': 'list'})(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    
+    def test_normalize_query(self):
+        self.assertEqual(
+            jsonapi_cache.normalize_query(QueryDict('sort=-int&include=b,a&filter[int]=1&x=1')),
+            jsonapi_cache.normalize_query(QueryDict('filter%5Bint%5D=1&include=a,b&sort=-int'))
+        )
+    
+    async def test_cached(self):
+        response = await self.get('sort=int')
+        async with self.assertNumQueriesAsync(0):
+            cached = await self.get('sort=int')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], response['Content-Type'])
+    
+    async def test_scoped_by_user(self):
+        await self.get('sort=int')
+        self.user = await User.objects.acreate(username='response-cache-other')
+        async with CaptureQueries() as queries:
+            await self.get('sort=int')
+        self.assertTrue(queries)
+    
+    def test_watched_models(self):
+        self.assertFalse(Collector('default').can_fast_delete(TestIncluded.objects.all()))
+        # Not reachable from a cached viewset, so it sends no cache signals
+        self.assertTrue(Collector('default').can_fast_delete(TestDirectCon.objects.all()))
+    
+    async def test_watched_once_enabled(self):
+        request = APIRequestFactory().get('/api/test/')
+        force_authenticate(request, user=self.user)
+        with mock.patch.object(jsonapi_cache, 'watched_models', set()), \
+                mock.patch.object(TestViewSet, 'cache_timeout', 60):
+            await TestViewSet.as_view({'get': 'list'})(request)
+            self.assertIn(Test, jsonapi_cache.watched_models)
+    
+    async def test_invalidated_by_included_type(self):
+        await self.get('sort=int')
+        self.included.text_included = 'changed'
+        await self.included.asave()
+        response = await self.get('sort=int')
+        included = json.loads(response.content)['included']
+        self.assertIn('changed', [obj['attributes'].get('text_included') for obj in included])
+
+
+class TestBenchmarkCommand(TestCase):
+    def test_benchmark(self):
+        output = StringIO()
+        call_command('jsonapi_benchmark', rows=[20], fanout=[2], page=10, repeat=1, 
+                     stdout=output)
+        results = json.loads(output.getvalue())['results']
+        self.assertEqual(len(results), 9)
+        for result in results:
+            self.assertEqual(result['fixture'], {'rows': 20, 'fanout': 2})
+            self.assertGreater(result['rows_per_s'], 0)
+            self.assertGreater(result['peak_alloc_kb'], 0)
+            if result['name'] == 'serializer:validated_data':
+                self.assertEqual(result['rows'], 10000)
+                self.assertEqual(result['queries'], 0)
+            else:
+                self.assertGreater(result['queries'], 0)
+        self.assertFalse(Test.objects.exists())
+
+
+class TestResources(SimpleTestCase):
+    def test_identifier(self):
+        identifier = ResourceIdentifier('test', 1)
+        self.assertEqual(identifier, {'type': 'test', 'id': 1})
+        self.assertEqual({'type': 'test', 'id': 1}, identifier)
+        self.assertEqual(len({identifier, ResourceIdentifier('test', 1)}), 1)
+        self.assertFalse(hasattr(identifier, '__dict__'))
+        self.assertEqual(pickle.loads(pickle.dumps(identifier)), identifier)
+    
+    def test_object(self):
+        obj = ResourceObject('test', 1, {'text': ''}, {}, {'self': '/test/1/'})
+        self.assertEqual(dict(obj), {'type': 'test', 'id': 1, 'attributes': {'text': ''}, 
+                                     'links': {'self': '/test/1/'}})
+        self.assertEqual(hash(obj.identifier), hash(ResourceIdentifier('test', 1)))
+        with self.assertRaises(TypeError):
+            hash(obj)
+        del obj['links']
+        self.assertNotIn('links', obj)
+        self.assertEqual(json.loads(JSONRenderer().render({'data': [obj]})), 
+                         {'data': [{'type': 'test', 'id': 1, 'attributes': {'text': ''}}]})
+
+
+class TestCachedProperty(SimpleTestCase):
+    @staticmethod
+    def get_class(shared=False):
+        class Cached:
+            calls = 0
+            
+            @cached_property(shared=shared)
+            async def value(self):
+                self.__class__.calls += 1
+                await asyncio.sleep(0)
+                return {}
+        return Cached
+    
+    async def test_falsy_value_is_cached(self):
+        cached = self.get_class()
+        obj = cached()
+        self.assertEqual(await obj.value, {})
+        self.assertEqual(await obj.value, {})
+        self.assertEqual(cached.calls, 1)
+    
+    async def test_concurrent_access_is_coalesced(self):
+        cached = self.get_class()
+        obj = cached()
+        results = await asyncio.gather(*(obj.value for _ in range(5)))
+        self.assertEqual(cached.calls, 1)
+        [self.assertIs(result, results[0]) for result in results]
+        self.assertFalse(cached.value._pending)
+    
+    async def test_shared_value(self):
+        cached = self.get_class(shared=True)
+        self.assertIs(await cached().value, await cached().value)
+        self.assertEqual(cached.calls, 1)
+        cached.value.cache_clear()
+        await cached().value
+        self.assertEqual(cached.calls, 2)
+        with self.assertRaises(AttributeError):
+            cached().value = {}
+
+    async def test_other_loop_is_not_awaited(self):
+        cached, other = self.get_class(shared=True), asyncio.new_event_loop()
+        try:
+            cached.value._pending[cached] = other.create_future()
+            self.assertEqual(await asyncio.wait_for(cached().value, 1), {})
+            self.assertEqual(cached.calls, 1)
+        finally:
+            other.close()
+
+
+class TestBoundFields(TestCase):
+    async def test_iteration(self):
+        obj = await Test.objects.acreate(text='bound', foreign_key=await TestIncluded.objects.acreate())
+        for serializer_class in (TestSerializer, TestModelViewSet.serializer):
+            serializer = serializer_class(obj)
+            with mock.patch.object(serializer_class, 'to_representation', autospec=True,
+                                   side_effect=serializer_class.to_representation) as method:
+                fields = [field async for field in serializer]
+                self.assertEqual(method.call_count, 1)
+            self.assertEqual([field.name for field in fields], 
+                             list(await serializer.fields))
+            self.assertEqual(fields[-2].value['text'], 'bound')
+            self.assertIs(await serializer[fields[0].name], fields[0])
+    
+    async def test_saved_instance(self):
+        obj = await Test.objects.acreate(text='before')
+        serializer = TestModelViewSet.serializer(obj, data={'data': {
+            'type': 'test', 'id': obj.pk, 'attributes': {
+                'text': 'after', 'int': 1, 'bool': True, 'choice_int': 1, 
+                'choice_str': 'UK', 'array': [1, 2]
+            }
+        }})
+        self.assertTrue(await serializer.is_valid(), await serializer.errors)
+        self.assertEqual((await serializer['attributes']).value['text'], 'before')
+        await serializer.save()
+        self.assertEqual((await serializer['attributes']).value['text'], 'after')
+
+    async def test_instance_change(self):
+        first, second = [await Test.objects.acreate(text=text) for text in ('first', 'second')]
+        request = RequestFactory().get('/api/test/')
+        serializer = TestSerializer(first, context={'request': request})
+        self.assertEqual((await serializer['attributes']).value['text'], 'first')
+        self.assertIn('/api/test/', (await serializer.representation)['data']['links']['self'])
+        serializer.instance = second
+        self.assertEqual((await serializer['attributes']).value['text'], 'second')
+
+
+class TestImportTimeCommand(SimpleTestCase):
+    def test_importtime(self):
+        output = StringIO()
+        call_command('jsonapi_importtime', modules=['jsonapi.serializer_model_async'], 
+                     repeat=1, top=3, stdout=output)
+        result, = json.loads(output.getvalue())['results']
+        self.assertGreater(result['total_ms'], 0)
+        self.assertLessEqual(len(result['top']), 3)
+        self.assertGreater(result['loaded'], 0)
+
+
+class TestWarmUp(SimpleTestCase):
+    async def test_warm_up(self):
+        report = await warm_up()
+        names = [result['name'] for result in report]
+        self.assertIn('adrf_jsonapi.views.TestModelViewSet', names)
+        self.assertIn(TestModelViewSet.serializer, TestModelViewSet.serializer.compiled_fields._shared)
+        compiled = report[names.index('adrf_jsonapi.views.TestViewSet')]['compiled']
+        self.assertEqual(compiled['links']['list'], '/api/test/')
+        self.assertIn('many_to_many', compiled['fields']['relationships'])
+    
+    def test_command(self):
+        output = StringIO()
+        call_command('jsonapi_warmup', stdout=output)
+        names = [result['name'] for result in json.loads(output.getvalue())['results']]
+        self.assertEqual(names[1:], [f'{viewset.__module__}.{viewset.__qualname__}' 
+                                     for viewset in get_viewsets()])
+    
+    @override_settings(JSONAPI_WARM_UP=True)
+    async def test_first_request(self):
+        view = TestViewSet.as_view({'get': 'list'})
+        with mock.patch('jsonapi.warmup.warm_up') as warm_up, \
+                mock.patch.object(JSONAPIViewSet, '_warmed_up', False):
+            # Refused by the permissions before the queryset is touched
+            responses = await asyncio.gather(*(view(APIRequestFactory().get('/api/test/')) 
+                                               for _ in range(2)))
+            await view(APIRequestFactory().get('/api/test/'))
+        warm_up.assert_awaited_once()
+        self.assertEqual({response.status_code for response in responses}, {403})
+
+
+class TestRelationshipMutation(JSONAPIQueriesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.related = [TestIncluded.objects.create() for _ in range(5)]
+        cls.obj = Test.objects.create(foreign_key=cls.related[0])
+        cls.obj.many_to_many.set(cls.related[:3])
+        cls.user = User.objects.create_user('mutation', is_staff=True)
+    
+    async def request(self, method, data, field_name='many_to_many', pk=None):
+        request = getattr(APIRequestFactory(), method)('/api/test/', {'data': data}, format='json')
+        force_authenticate(request, user=self.user)
+        return await TestViewSet.as_view({method: 'self'})(
+            request, pk=pk or self.obj.pk, field_name=field_name
+        )
+    
+    def get_identifiers(self, *objects):
+        return [{'type': 'test-included', 'id': obj.pk} for obj in objects]
+    
+    async def get_through_rows(self):
+        through = Test.many_to_many.through.objects.filter(test=self.obj)
+        return {related: pk async for pk, related in through.values_list('pk', 'testincluded_id')}
+    
+    async def test_replace(self):
+        before = await self.get_through_rows()
+        response = await self.request('put', self.get_identifiers(*self.related[1:4]))
+        self.assertEqual(response.status_code, 204)
+        after = await self.get_through_rows()
+        self.assertEqual(set(after), {obj.pk for obj in self.related[1:4]})
+        # The kept rows are not rewritten
+        for obj in self.related[1:3]:
+            self.assertEqual(after[obj.pk], before[obj.pk])
+    
+    async def test_add_remove(self):
+        await self.request('post', self.get_identifiers(*self.related[2:5]))
+        self.assertEqual(len(await self.get_through_rows()), 5)
+        await self.request('delete', self.get_identifiers(*self.related[:2]))
+        self.assertEqual(set(await self.get_through_rows()), {obj.pk for obj in self.related[2:]})
+    
+    async def test_to_one(self):
+        response = await self.request('patch', self.get_identifiers(self.related[4])[0], 'foreign_key')
+        self.assertEqual(response.status_code, 204)
+        await self.obj.arefresh_from_db()
+        self.assertEqual(self.obj.foreign_key_id, self.related[4].pk)
+        response = await self.request('post', self.get_identifiers(self.related[4])[0], 'foreign_key')
+        self.assertEqual(response.status_code, 403)
+    
+    async def test_errors(self):
+        response = await self.request('put', [{'type': 'test', 'id': self.obj.pk}, 
+                                              {'type': 'test-included', 'id': 0}])
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('type', response.data['errors'])
+        response = await self.request('put', [{'type': 'test-included', 'id': 0}])
+        self.assertEqual(response.data['errors'], {'id': ['"0" does not exist.']})
+        response = await self.request('put', self.get_identifiers(self.related[0]), pk=10 ** 6)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(await self.get_through_rows()), 3)
+
+    async def test_signals(self):
+        actions = []
+        receiver = lambda action, pk_set, **kwargs: actions.append((action, pk_set))
+        m2m_changed.connect(receiver, sender=Test.many_to_many.through)
+        try:
+            await self.request('put', self.get_identifiers(*self.related[1:4]))
+        finally:
+            m2m_changed.disconnect(receiver, sender=Test.many_to_many.through)
+        self.assertIn(('post_remove', {self.related[0].pk}), actions)
+        self.assertIn(('post_add', {self.related[3].pk}), actions)
+
+    async def test_to_one_constraints(self):
+        field = Test._meta.get_field('foreign_key')
+        with mock.patch.object(field, 'null', False):
+            response = await self.request('patch', None, 'foreign_key')
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('foreign_key', response.data['errors'])
+        with mock.patch.object(field.remote_field, 'limit_choices_to',
+                               {'pk__lt': self.related[4].pk}):
+            response = await self.request('patch', self.get_identifiers(self.related[4])[0],
+                                          'foreign_key')
+        self.assertEqual(response.status_code, 403)
+        await self.obj.arefresh_from_db()
+        self.assertEqual(self.obj.foreign_key_id, self.related[0].pk)
+
+
+class TestRelationshipScope(TestCase):
+    """
+    The relationship endpoints only reach parents of the viewset's queryset 
+    and check their object permissions.
+    """
+    class DenyObjects(AuthenticatedReadIsStaffOtherPermission):
+        def has_object_permission(self, request, view, obj):
+            return False
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.related = [TestIncluded.objects.create() for _ in range(2)]
+        cls.obj = Test.objects.create(foreign_key=cls.related[0])
+        cls.obj.many_to_many.set(cls.related)
+        cls.user = User.objects.create_user('scope', is_staff=True)
+        
+        class Hidden(TestViewSet):
+            queryset = TestViewSet.queryset.exclude(pk=cls.obj.pk)
+        
+        class Denied(TestViewSet):
+            permission_classes = [cls.DenyObjects]
+        cls.hidden, cls.denied = Hidden, Denied
+    
+    async def request(self, viewset, action, field_name, method='get', data=None):
+        request = getattr(APIRequestFactory(), method)('/api/test/', data, format='json')
+        force_authenticate(request, user=self.user)
+        return await viewset.as_view({method: action})(
+            request, pk=self.obj.pk, field_name=field_name
+        )
+    
+    async def test_linkage(self):
+        for field_name in ('foreign_key', 'many_to_many'):
+            response = await self.request(self.hidden, 'self', field_name)
+            self.assertEqual(response.status_code, 404)
+            response = await self.request(self.denied, 'self', field_name)
+            self.assertEqual(response.status_code, 403)
+    
+    async def test_related(self):
+        for field_name in ('foreign_key', 'many_to_many'):
+            response = await self.request(self.hidden, 'related', field_name)
+            self.assertEqual(response.status_code, 404)
+            response = await self.request(self.denied, 'related', field_name)
+            self.assertEqual(response.status_code, 403)
+    
+    async def test_update(self):
+        cases = (('foreign_key', 'patch', {'type': 'test-included', 'id': self.related[1].pk}),
+                 ('many_to_many', 'put', []))
+        for field_name, method, data in cases:
+            response = await self.request(self.hidden, 'self', field_name, method, {'data': data})
+            self.assertEqual(response.status_code, 404)
+            response = await self.request(self.denied, 'self', field_name, method, {'data': data})
+            self.assertEqual(response.status_code, 403)
+        await self.obj.arefresh_from_db()
+        self.assertEqual(self.obj.foreign_key_id, self.related[0].pk)
+        self.assertEqual(await self.obj.many_to_many.acount(), 2)
+    
+    async def test_related_viewsets_follow_urlconf(self):
+        self.assertIsNotNone(TestViewSet.get_model_viewset(TestIncluded))
+        with override_settings(ROOT_URLCONF='jsonapi.tests'):
+            self.assertIsNone(TestViewSet.get_model_viewset(TestIncluded))
+        self.assertIsNotNone(TestViewSet.get_model_viewset(TestIncluded))
+
+
+class TestWriteUnit(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.related = [TestIncluded.objects.create() for _ in range(3)]
+    
+    async def test_create(self):
+        serializer = TestModelViewSet.serializer(data={'data': {
+            'type': 'test', 'attributes': {'text': 'created', 'int': 1, 'bool': True, 
+                                           'choice_int': 1, 'choice_str': 'UK', 'array': [1, 2]},
+            'relationships': {'foreign_key': {'data': {'type': 'test-included', 
+                                                       'id': self.related[0].pk}}}
+        }})
+        self.assertTrue(await serializer.is_valid(), await serializer.errors)
+        with Profile() as profile:
+            obj = await serializer.save()
+        self.assertEqual(profile.handoffs, 1)
+        self.assertEqual((await Test.objects.aget(pk=obj.pk)).foreign_key_id, self.related[0].pk)
+    
+    async def test_create_endpoint(self):
+        request = APIRequestFactory().post('/api/test-model/', {'data': {
+            'type': 'test', 'attributes': {'text': 'created', 'int': 1, 'bool': True, 
+                                           'choice_int': 1, 'choice_str': 'UK', 'array': [1, 2]},
+            'relationships': {'foreign_key': {'data': {'type': 'test-included', 
+                                                       'id': self.related[1].pk}}}
+        }}, format='json')
+        force_authenticate(request, user=await User.objects.acreate(username='write', is_staff=True))
+        async with CaptureQueries() as queries:
+            response = await TestModelViewSet.as_view({'post': 'create'})(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        obj = await Test.objects.aget(text='created')
+        self.assertEqual(response.data['data']['id'], obj.pk)
+        self.assertEqual(response.data['data']['relationships']['many_to_many']['data'], [])
+        self.assertEqual([item['id'] for item in response.data['included']], [self.related[1].pk])
+        # The created row is never read back
+        self.assertFalse([sql for _, sql in queries.captured 
+                          if sql.startswith('SELECT') and 'adrf_jsonapi_test' in sql])
+        self.assertEqual(response['Location'], response.data['data']['links']['self'])
+    
+    async def test_create_list_endpoint(self):
+        request = APIRequestFactory().post('/api/test-model/', {'data': [{
+            'type': 'test', 'attributes': {'text': f'bulk-{index}', 'int': 1, 'bool': True, 
+                                           'choice_int': 1, 'choice_str': 'UK', 'array': [1]},
+            'relationships': {'many_to_many': {'data': [{'type': 'test-included', 
+                                                         'id': self.related[index].pk}]}}
+        } for index in range(2)]}, format='json')
+        force_authenticate(request, user=await User.objects.acreate(username='bulk', is_staff=True))
+        async with CaptureQueries() as queries:
+            response = await TestModelViewSet.as_view({'post': 'create'})(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotIn('Location', response)
+        self.assertEqual([obj['attributes']['text'] for obj in response.data['data']], 
+                         ['bulk-0', 'bulk-1'])
+        self.assertEqual(await Test.objects.filter(text__startswith='bulk-').acount(), 2)
+        self.assertEqual(len([sql for _, sql in queries.captured 
+                              if sql.startswith('INSERT INTO "adrf_jsonapi_test"')]), 1)
+    
+    async def test_validated_data(self):
+        serializer = TestModelViewSet.serializer(many=True)
+        serializer._validated_data = [{'text': 'a', 'foreign_key': self.related[0]},
+                                      {'text': 'b', 'many_to_many': self.related[1:]}]
+        validated_data = await serializer.validated_data
+        self.assertEqual(validated_data[0], {'text': 'a', 'foreign_key': {
+            'type': 'test-included', 'id': self.related[0].pk
+        }})
+        self.assertEqual(validated_data[1]['many_to_many'], [
+            {'type': 'test-included', 'id': rel.pk} for rel in self.related[1:]
+        ])
+        # Memoized, and the instances are kept for save()
+        self.assertIs(await serializer.validated_data, validated_data)
+        self.assertIs(serializer._validated_data[0]['foreign_key'], self.related[0])
+    
+    async def test_update_many_to_many(self):
+        obj = await Test.objects.acreate(text='before')
+        unit = WriteUnit(Test, {'text': 'after', 'many_to_many': self.related[:2]}, obj)
+        self.assertIs(await unit.asave(), obj)
+        self.assertEqual(unit.linkage, {'many_to_many': [rel.pk for rel in self.related[:2]]})
+        self.assertEqual(await Test.objects.filter(text='after').acount(), 1)
+        self.assertEqual(await obj.many_to_many.acount(), 2)
+    
+    async def test_save_batch(self):
+        save_batch = sync_to_async(WriteUnit.save_batch)
+        units = [WriteUnit(Test, {'text': str(i)}) for i in range(3)]
+        async with CaptureQueries() as queries:
+            results = await save_batch(units)
+        self.assertEqual([obj.text for obj in results], ['0', '1', '2'])
+        self.assertEqual(len([sql for _, sql in queries.captured if sql.startswith('INSERT')]), 1)
+        
+        class Unit(WriteUnit):
+            def post_process(self):
+                if self.instance.text == 'raises':
+                    raise ValueError('raises')
+        # A failed bulk write falls back to a savepoint per row
+        results = await save_batch([Unit(Test, {'text': 'ok'}), Unit(Test, {'id': results[0].pk}),
+                                    Unit(Test, {'text': 'raises'})])
+        self.assertEqual(results[0].text, 'ok')
+        self.assertIsInstance(results[1], DatabaseError)
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual(await Test.objects.filter(text__in=['ok', 'raises']).acount(), 1)
+    
+    async def test_many_to_many_signals(self):
+        obj, actions = await Test.objects.acreate(), []
+        
+        def receiver(sender, action, pk_set, **kwargs):
+            actions.append((action, pk_set))
+        m2m_changed.connect(receiver, sender=Test.many_to_many.through)
+        try:
+            await WriteUnit(Test, {'many_to_many': self.related[:1]}, obj).asave()
+        finally:
+            m2m_changed.disconnect(receiver, sender=Test.many_to_many.through)
+        self.assertIn(('post_add', {self.related[0].pk}), actions)
+
+
+class TestBulkValidation(TestCase):
+    items = [5, {'type': 'test', 'attributes': {'int': 'x'}, 'relationships': {
+        'foreign_key': {'data': {'type': 'test-included', 'id': 0}}
+    }}]
+    
+    async def validate(self, **context):
+        serializer = TestModelViewSet.serializer(data={'data': self.items * 3}, many=True,
+                                                 context=context)
+        self.assertFalse(await serializer.is_valid())
+        return (await serializer.errors)['errors']
+    
+    async def test_first_error(self):
+        self.assertEqual(await self.validate(), [{'code': 403, 'source': {'pointer': '/data/0'}, 
+            'detail': 'The JSON field "data" caused an exception: '
+                      'the field must contain a valid object description.'}])
+    
+    async def test_max_errors(self):
+        # Counted in invalid items, each with all of its errors
+        pointers = [error['source']['pointer'] for error in await self.validate(max_errors=3)]
+        self.assertEqual(pointers[0], '/data/0')
+        self.assertEqual(pointers[-1], '/data/2')
+        self.assertIn('/data/1/attributes/int', pointers)
+        self.assertIn('/data/1/relationships/foreign_key', pointers)
+        self.items = self.items[::-1]
+        pointers = [error['source']['pointer'] for error in await self.validate()]
+        self.assertGreater(len(pointers), 1)
+        self.assertEqual({pointer.split('/')[2] for pointer in pointers}, {'0'})
+        with self.assertRaises(ImproperlyConfigured):
+            await self.validate(max_errors=0)
+    
+    async def test_all_errors(self):
+        pointers = [error['source']['pointer'] for error in await self.validate(max_errors=None)]
+        self.assertEqual(pointers.count('/data/0'), 1)
+        self.assertIn('/data/5/relationships/foreign_key', pointers)
+        self.assertEqual(len(pointers), 3 * len(set(pointer for pointer in pointers 
+                                                    if pointer.startswith('/data/1/'))) + 3)
+
+
+class IngestItems:
+    def get_item(self, text):
+        return {'type': 'test', 'attributes': {
+            'text': text, 'int': 1, 'bool': True, 'choice_int': 1, 'choice_str': 'UK', 'array': [1]
+        }, 'relationships': {'foreign_key': {'data': {'type': 'test-included', 
+                                                      'id': self.related.pk}}}}
+
+
+class TestIngest(IngestItems, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.related = TestIncluded.objects.create()
+        cls.user = User.objects.create(username='ingest', is_staff=True)
+    
+    async def ingest(self, body, content_type):
+        request = APIRequestFactory().post('/api/test-model/ingest/', body, 
+                                           content_type=content_type)
+        force_authenticate(request, user=self.user)
+        response = await TestModelViewSet.as_view({'post': 'ingest'})(request)
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        *results, meta = [json.loads(line) for line in lines]
+        return sorted(results, key=lambda result: result['index']), meta['meta']
+    
+    def test_reader(self):
+        body = json.dumps({'data': [self.get_item(str(i)) for i in range(5)] + [12345]})
+        reader = IngestReader(BytesIO(body.encode()), ndjson=False, chunk_size=7)
+        items = reader.read(4) + reader.read(4)
+        self.assertEqual([index for index, _ in items], list(range(6)))
+        self.assertEqual([obj['attributes']['text'] for _, obj in items[:5]], 
+                         ['0', '1', '2', '3', '4'])
+        self.assertEqual(items[5][1], 12345)
+        # The members before "data" are skipped, whatever their size
+        body = json.dumps({'jsonapi': {'version': '1.1'}, 'meta': {'note': 'x' * 50}, 
+                           'data': [self.get_item('0')]})
+        items = IngestReader(BytesIO(body.encode()), ndjson=False, chunk_size=5).read(4)
+        self.assertEqual([obj['attributes']['text'] for _, obj in items], ['0'])
+        for body in (b'{"meta": {}}', b'{"data": {}}', b'[]', b'{"meta": '):
+            items = IngestReader(BytesIO(body), ndjson=False, chunk_size=5).read(4)
+            self.assertEqual(len(items), 1, body)
+            self.assertIsInstance(items[0][1], ValueError)
+        self.assertEqual(IngestReader(BytesIO(b'{"data": [ ]}'), ndjson=False).read(4), [])
+        # Missing, doubled and trailing commas end the read
+        for body, count in ((b'{"data": [,,{"a": 1},,{"b": 2}]}', 0), 
+                            (b'{"data": [{"a": 1}{"b": 2}]}', 1), 
+                            (b'{"data": [{"a": 1},]}', 1)):
+            items = IngestReader(BytesIO(body), ndjson=False, chunk_size=5).read(4)
+            self.assertEqual([obj for _, obj in items[:count]], [{'a': 1}][:count], body)
+            self.assertEqual(len(items), count + 1, body)
+            self.assertIsInstance(items[-1][1], ValueError)
+        reader = IngestReader(BytesIO(b'{"a": 1}\n\n{bad\n{"b": 2}'), chunk_size=3)
+        items = reader.read(10)
+        self.assertEqual([index for index, _ in items], [0, 2, 3])
+        self.assertIsInstance(items[1][1], ValueError)
+        self.assertEqual(items[2][1], {'b': 2})
+    
+    async def test_ndjson(self):
+        body = b'\n'.join([json.dumps(self.get_item('a')).encode(), b'{bad', 
+                           json.dumps({'type': 'test'}).encode(), 
+                           json.dumps(self.get_item('b')).encode()])
+        with mock.patch.object(TestModelViewSet, 'ingest_batch_size', 2):
+            results, meta = await self.ingest(body, 'application/x-ndjson')
+        self.assertEqual(meta, {'created': 2, 'failed': 2})
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertEqual(results[2]['errors'][0]['source']['pointer'], '/attributes/text')
+        self.assertEqual(sorted([results[0]['data']['id'], results[3]['data']['id']]), 
+                         [pk async for pk in Test.objects.order_by('pk').values_list('pk', flat=True)])
+    
+    async def test_document(self):
+        body = json.dumps({'data': [self.get_item('a'), 5, self.get_item('b')]})
+        results, meta = await self.ingest(body, 'application/vnd.api+json')
+        self.assertEqual(meta, {'created': 2, 'failed': 1})
+        self.assertEqual(results[1]['errors'][0]['source']['pointer'], '/data/1')
+        self.assertEqual(await Test.objects.filter(text__in=['a', 'b']).acount(), 2)
+
+
+class TestJobs(IngestItems, TransactionTestCase):
+    """
+    The jobs run on the pool's own threads, with their own connections, so 
+    the data they read must be committed.
+    """
+    def setUp(self):
+        self.related = TestIncluded.objects.create()
+        self.user = User.objects.create(username='jobs', is_staff=True)
+        self.pool = JobPool(workers=1)
+        self.addCleanup(self.pool.shutdown, cancel=True)
+        patcher = mock.patch.object(TestModelViewSet, 'job_pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    async def request(self, method, path, body=None, action='create', 
+                      content_type='application/vnd.api+json', **kwargs):
+        request = getattr(APIRequestFactory(), method)(
+            path, body, HTTP_PREFER='respond-async', content_type=content_type
+        )
+        force_authenticate(request, user=self.user)
+        return await TestModelViewSet.as_view({method: action}, basename='test-model')(
+            request, **kwargs
+        )
+    
+    async def test_job(self):
+        body = json.dumps({'jsonapi': {'version': '1.1'}, 
+                           'data': [self.get_item('a'), {'type': 'test'}, self.get_item('b')]})
+        response = await self.request('post', '/api/test-model/', body)
+        self.assertEqual(response.status_code, 202)
+        job = self.pool.get(response.data['data']['id'])
+        self.assertEqual(response['Content-Location'], response.data['data']['links']['self'])
+        await job.wait()
+        response = await self.request('get', response['Content-Location'], action='jobs', 
+                                      job_id=job.id)
+        attributes = response.data['data']['attributes']
+        self.assertEqual((attributes['status'], attributes['created'], attributes['failed']), 
+                         ('succeeded', 2, 1))
+        self.assertEqual(attributes['errors'][0]['index'], 1)
+        self.assertEqual(await Test.objects.filter(text__in=['a', 'b']).acount(), 2)
+    
+    async def test_single_resource(self):
+        # Parsed like any create, so the media type needs a parser
+        body = json.dumps({'data': self.get_item('single')})
+        response = await self.request('post', '/api/test-model/', body, 
+                                      content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.pool.jobs), 0)
+        self.assertTrue(await Test.objects.filter(text='single').aexists())
+    
+    async def test_cancel(self):
+        started, release = threading.Event(), threading.Event()
+        
+        async def block(job):
+            started.set()
+            await asyncio.to_thread(release.wait)
+        
+        async def poll(job):
+            while not job.is_cancelled:
+                await asyncio.sleep(0.01)
+        running, queued = self.pool.submit(block), self.pool.submit(poll)
+        await asyncio.to_thread(started.wait)
+        response = await self.request('delete', '/api/test-model/jobs/', action='jobs', 
+                                      job_id=queued.id)
+        self.assertEqual(response.data['data']['attributes']['status'], 'cancelled')
+        release.set()
+        await running.wait()
+        self.assertEqual(running.status, 'succeeded')
+        polling = self.pool.submit(poll)
+        polling.cancel()
+        await polling.wait()
+        self.assertEqual(polling.status, 'cancelled')
+        self.assertEqual(len(self.pool), 0)
@@ -1,11 +1,18 @@
-from re import sub
-from django.core.exceptions import ImproperlyConfigured
+import json
+from re import sub, compile
+from codecs import getincrementaldecoder
+from contextlib import suppress
+from django.core.exceptions import ImproperlyConfigured, FieldDoesNotExist
+from django.db import models, router, transaction
+from django.http import QueryDict
 from rest_framework.fields import Field
+from rest_framework.exceptions import ValidationError
 from rest_framework.utils import model_meta
-from functools import cached_property
-from asyncio import ensure_future
+from asyncio import shield, get_running_loop, CancelledError
 
-from .helpers import getattr
+from .cache import bump_version, normalize_query
+from .instrumentation import sync_to_async
+from .helpers import getattr, get_to_one_field
 
 
 # TODO: to test all of the lookups
@@ -18,8 +25,10 @@ class JSONAPIFilter:
     async def filter_queryset(self):
         return self.queryset.filter(**await self._get_params())
         
-    async def _get_params(self):
-        for key, val in self.request.query_params.items():
+    async def _get_params(self, query_params=None):
+        if query_params is None:
+            query_params = self.request.query_params
+        for key, val in query_params.items():
             if not key.startswith('filter['):
                 continue
             key = key.split('[')[-1].replace(']', '')
@@ -50,6 +59,76 @@ class JSONAPIFilter:
         return self.params
 
 
+class JSONAPIQuery:
+    """
+    The `filter[...]`, `sort` and `include` parameters of a list request 
+    parsed into the queryset filters, ordering and select/prefetch plan.
+    
+    Named presets on `JSONAPIViewSet.presets` keep their parsed instance, so
+    they are compiled only once; `ttl` caches their responses like
+    `cache_timeout` does, see `jsonapi.cache.cache_response`.
+    
+    Unknown `sort` fields and `include` paths raise a `ValidationError`.
+    """
+    # Prefixes of the JSON:API parameters a preset does not fix
+    ignored_params = ('page[',)
+    
+    def __init__(self, query='', ttl=None, filterset_class=JSONAPIFilter):
+        self.query = query if isinstance(query, QueryDict) else QueryDict(query)
+        self.key = self.normalize(self.query)
+        self.ttl, self.filterset_class = ttl, filterset_class
+        self.params = self.ordering = None
+        self.select_related, self.prefetch_related = [], []
+    
+    @classmethod
+    def normalize(cls, query_params):
+        return normalize_query(query_params, ignored=cls.ignored_params)
+    
+    async def compile(self, queryset):
+        if self.params is not None:
+            return self
+        model = queryset.model
+        params = await self.filterset_class(queryset, None)._get_params(self.query)
+        ordering, select_related, prefetch_related = [], [], []
+        for name in filter(None, ','.join(self.query.getlist('sort')).split(',')):
+            field_name = name.lstrip('-')
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.many_to_many:
+                raise ValidationError({'sort': [f'"{field_name}" is not a sortable field.']})
+            ordering.append(name[:-len(field_name)] + field.attname)
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('id')
+        for path in filter(None, ','.join(self.query.getlist('include')).split(',')):
+            current = model
+            for name in path.split('.'):
+                try:
+                    field = current._meta.get_field(name)
+                except FieldDoesNotExist:
+                    field = None
+                if field is None or field.related_model is None:
+                    raise ValidationError({'include': [f'"{path}" is not a valid relationship path.']})
+                current = field.related_model
+            if '.' not in path and get_to_one_field(model, path) is not None:
+                select_related.append(path)
+            else:
+                prefetch_related.append(path.replace('.', '__'))
+        self.select_related, self.prefetch_related = select_related, prefetch_related
+        self.params, self.ordering = params, ordering
+        return self
+    
+    async def apply(self, queryset):
+        await self.compile(queryset)
+        queryset = queryset.filter(**self.params).order_by(*self.ordering)
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
 class JSONAPISerializerRepr:
     def __init__(self, serializer, indent=1, force_many=None):
         self._serializer = serializer
@@ -124,35 +203,155 @@ class NotSelectedForeignKey(ImproperlyConfigured):
         super().__init__(self.message)
 
 
-class cached_property(cached_property):
-    async def __get__(self, instance, owner=None):
+_missing = object()
+
+
+class cached_property:
+    """
+    Awaitable memoization descriptor for the `async def` properties.
+    
+    A miss is detected with a sentinel, so falsy results are cached too, and
+    concurrent first accesses are coalesced onto one computation. With
+    `shared=True` the result is cached once per class instead of per
+    instance, which suits immutable results like field plans, and 
+    `cache_clear()` drops it; such a result cannot be assigned. Being a data
+    descriptor, it always returns an awaitable; `del obj.attr` drops the 
+    cached value. Only the accesses from the same event loop are coalesced.
+    """
+    def __init__(self, func=None, *, shared=False):
+        self.func, self.shared, self.attrname = None, shared, None
+        self._pending, self._shared = {}, {}
+        if func is not None:
+            self(func)
+
+    def __call__(self, func):
+        self.func, self.__doc__ = func, func.__doc__
+        return self
+
+    def __set_name__(self, owner, name):
+        if self.attrname is None:
+            self.attrname = name
+        elif name != self.attrname:
+            raise TypeError(
+                "Cannot assign the same cached_property to two different names "
+                f"({self.attrname!r} and {name!r})."
+            )
+
+    def __get__(self, instance, owner=None):
         if instance is None:
             return self
         if self.attrname is None:
             raise TypeError(
                 "Cannot use cached_property instance without calling __set_name__ on it.")
+        return self._get(instance)
+
+    def __set__(self, instance, value):
+        if self.shared:
+            raise AttributeError(
+                f"Cannot assign {self.attrname!r}, it is cached for the whole class.")
+        cache, key = self._get_cache(instance)
+        cache[key] = value
+
+    def __delete__(self, instance):
+        cache, key = self._get_cache(instance)
+        cache.pop(key, None)
+
+    def _get_cache(self, instance):
+        if self.shared:
+            return self._shared, type(instance)
         try:
-            cache = instance.__dict__
+            return instance.__dict__, self.attrname
         except AttributeError:
             msg = (
                 f"No '__dict__' attribute on {type(instance).__name__!r} "
                 f"instance to cache {self.attrname!r} property."
             )
             raise TypeError(msg) from None
-        if not cache.get(self.attrname):
-            val = await ensure_future(self.func(instance))
+
+    async def _get(self, instance):
+        cache, key = self._get_cache(instance)
+        pending_key, loop = key if self.shared else id(instance), get_running_loop()
+        while True:
+            val = cache.get(key, _missing)
+            if val is not _missing:
+                return val
+            pending = self._pending.get(pending_key)
+            if pending is None or pending.get_loop() is not loop:
+                break
             try:
-                cache[self.attrname] = val
+                val = await shield(pending)
+            except CancelledError:
+                if not pending.cancelled():
+                    raise
+            else:
+                return val
+        pending = self._pending[pending_key] = loop.create_future()
+        try:
+            val = await self.func(instance)
+            try:
+                cache[key] = val
             except TypeError:
                 msg = (
                     f"The '__dict__' attribute on {type(instance).__name__!r} instance "
                     f"does not support item assignment for caching {self.attrname!r} property."
                 )
                 raise TypeError(msg) from None
+        except CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as exc:
+            pending.set_exception(exc)
+            pending.exception()
+            raise
         else:
-            val = cache[self.attrname]
+            pending.set_result(val)
+        finally:
+            if self._pending.get(pending_key) is pending:
+                del self._pending[pending_key]
         return val
 
+    def cache_clear(self):
+        self._shared.clear()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key: while `run(key, func)` is in flight, 
+    the callers with the same key await its result (or exception) instead of 
+    calling `func` again. Nothing is kept once the call has finished.
+    """
+    def __init__(self):
+        self._pending = {}
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    async def run(self, key, func, *args, **kwargs):
+        loop = get_running_loop()
+        while (pending := self._pending.get(key)) is not None and pending.get_loop() is loop:
+            try:
+                return await shield(pending)
+            except CancelledError:
+                if not pending.cancelled():
+                    raise
+        pending = self._pending[key] = loop.create_future()
+        try:
+            result = await func(*args, **kwargs)
+        except CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as exc:
+            pending.set_exception(exc)
+            pending.exception()
+            raise
+        else:
+            pending.set_result(result)
+        finally:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+        return result
+
+
 class RaiseNested:
     errors = {
         'not_writtable_nested':
@@ -172,25 +371,305 @@ class RaiseNested:
         self.model_field_info = model_meta.get_field_info(serializer.Meta.model)
     
     async def raise_nested_writes(self):
+        fields = [field async for field in self.serializer._writable_fields]
         assert not any(
             isinstance(field, Field) and
             (field.source in self.validated_data) and
             (field.source in self.model_field_info.relations) and
             isinstance(self.validated_data[field.source], (list, dict))
-            for field in await self.serializer._writable_fields
+            for field in fields
         ), (self.errors['not_writtable_nested'].format(
             method_name=self.method_name,
             module=self.serializer.__class__.__module__,
             class_name=self.serializer.__class__.__name__
         ))
         assert not any(
-            len(field.source_attrs) > 1 and
+            len(getattr.func(field, 'source_attrs', ())) > 1 and
             (field.source_attrs[0] in self.validated_data) and
             (field.source_attrs[0] in self.model_field_info.relations) and
             isinstance(self.validated_data[field.source_attrs[0]], (list, dict))
-            for field in await self.serializer._writable_fields
-        ), (self.errors['not_writtable_dotted_source'].format(
+            for field in fields
+        ), (self.errors['not_writtable_dotted-source'].format(
             method_name=self.method_name, 
             module=self.serializer.__class__.__module__,
             class_name=self.serializer.__class__.__name__
         ))
+
+
+class WriteUnit:
+    """
+    One create or update of a model serializer. The row, its many-to-many 
+    linkage and `post_process()` run in a single `sync_to_async()` call 
+    inside `transaction.atomic()`, so a write costs one thread handoff.
+    
+    After `asave()`, `instance` holds the saved object, with the related 
+    objects from `validated_data` cached on it, and `linkage` the 
+    {name: [related pks]} that were written. The instance renders without 
+    being read back: a new object caches its unwritten many-to-many 
+    relations as empty.
+    """
+    def __init__(self, model, validated_data, instance=None):
+        self.model, self.instance = model, instance
+        info = model_meta.get_field_info(model)
+        self.fields, self.many_to_many, self.linkage = {}, {}, {}
+        for name, value in validated_data.items():
+            if name in info.relations and info.relations[name].to_many:
+                self.many_to_many[name] = value
+            else:
+                self.fields[name] = value
+        self.using = router.db_for_write(model, instance=instance)
+    
+    async def asave(self):
+        return await sync_to_async(self.save)()
+    
+    def save(self):
+        is_new = self.instance is None
+        with transaction.atomic(using=self.using):
+            if is_new:
+                self.instance = self.model._default_manager.db_manager(self.using).create(
+                    **self.fields
+                )
+            else:
+                for name, value in self.fields.items():
+                    setattr(self.instance, name, value)
+                self.instance.save(using=self.using)
+            # The linkage needs the pk, so it is written after the row
+            for name, value in self.many_to_many.items():
+                self.set_many_to_many(name, value)
+            self.post_process()
+        if is_new:
+            self.cache_unwritten_many_to_many()
+        return self.instance
+    
+    def cache_unwritten_many_to_many(self):
+        for field in self.model._meta.many_to_many:
+            if field.name not in self.many_to_many:
+                self.cache_many_to_many(field.name, [])
+    
+    @classmethod
+    def save_batch(cls, units):
+        """
+        Creates new units with one `bulk_create()`. When some units are 
+        updates, or the bulk write fails, the units are saved one by one in 
+        one transaction, each in its own savepoint, so a row that fails is 
+        returned as its exception instead of rolling back the batch.
+        """
+        if all(unit.instance is None for unit in units):
+            try:
+                return cls.create_batch(units)
+            except Exception:
+                for unit in units:
+                    unit.instance, unit.linkage = None, {}
+        results = []
+        with transaction.atomic(using=units[0].using):
+            for unit in units:
+                try:
+                    results.append(unit.save())
+                except Exception as exc:
+                    results.append(exc)
+        return results
+    
+    @classmethod
+    def create_batch(cls, units):
+        """
+        Inserts the rows of new units of one model with one `bulk_create()`, 
+        then writes their linkage and runs `post_process()`, all in one 
+        transaction.
+        """
+        model, using = units[0].model, units[0].using
+        with transaction.atomic(using=using):
+            instances = model._default_manager.db_manager(using).bulk_create(
+                [model(**unit.fields) for unit in units]
+            )
+            for unit, instance in zip(units, instances):
+                unit.instance = instance
+                for name, value in unit.many_to_many.items():
+                    unit.set_many_to_many(name, value)
+                unit.post_process()
+        # `bulk_create()` sends no `post_save`
+        bump_version(model)
+        for unit in units:
+            unit.cache_unwritten_many_to_many()
+        return instances
+    
+    def set_many_to_many(self, name, value):
+        """
+        Writes the linkage with the related manager's `set()`, like DRF 
+        does, so `m2m_changed` is sent and the through defaults apply.
+        """
+        pks = [getattr.func(obj, 'pk', obj) for obj in value]
+        getattr.func(self.instance, name).set(value)
+        self.linkage[name] = pks
+        if all(isinstance(obj, models.Model) for obj in value):
+            self.cache_many_to_many(name, value)
+    
+    def cache_many_to_many(self, name, objects):
+        """
+        Stores the related objects the way `prefetch_related()` does.
+        """
+        manager = getattr.func(self.instance, name)
+        queryset = manager.all()
+        queryset._result_cache, queryset._prefetch_done = list(objects), True
+        self.instance.__dict__.setdefault('_prefetched_objects_cache', {})[
+            manager.prefetch_cache_name] = queryset
+    
+    def post_process(self):
+        """
+        Runs in the write transaction, after the row and its linkage.
+        """
+        pass
+
+
+class IngestReader:
+    """
+    Reads the resource objects of a request body in batches, a chunk at a
+    time: NDJSON, one object per line, or the `data` array of a JSON:API
+    document, decoded element by element after skipping the top-level 
+    members before it. `read()` returns (index, object) pairs, where the 
+    object is a ValueError for an item that is not JSON. A malformed array 
+    ends the read with a ValueError item.
+    """
+    object_start, array_start = compile(r'\s*\{'), compile(r'\[')
+    # A top-level member name with its colon, and the comma after a member
+    member, member_end = compile(r'\s*("(?:[^"\\]|\\.)*")\s*:\s*'), compile(r'\s*,')
+    whitespace = compile(r'\s*')
+    # A value that doesn't decode within this many characters is an error
+    max_item_size = 1024 * 1024
+    
+    def __init__(self, stream, ndjson=True, chunk_size=64 * 1024):
+        self.stream, self.ndjson, self.chunk_size = stream, ndjson, chunk_size
+        self.decoder, self.json_decoder = getincrementaldecoder('utf-8')(), json.JSONDecoder()
+        self.buffer, self.pos, self.index = '', 0, 0
+        self.is_eof, self.is_done, self.is_started = stream is None, False, ndjson
+        # Whether the next array token must be a comma or the closing bracket
+        self.expect_comma = False
+    
+    def fill(self):
+        """
+        Appends the next chunk of the body to the unread part of the buffer, 
+        returns False at the end of the body.
+        """
+        if self.is_eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.is_eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=self.is_eof)
+        self.pos = 0
+        return True
+    
+    def read(self, size):
+        items = []
+        while len(items) < size and not self.is_done:
+            item = self.read_line() if self.ndjson else self.read_element()
+            if item is not None:
+                items.append(item)
+        return items
+    
+    def get_item(self, obj):
+        index, self.index = self.index, self.index + 1
+        return index, obj
+    
+    def get_error(self, message):
+        self.is_done = True
+        return self.get_item(ValueError(message))
+    
+    def read_line(self):
+        end = self.buffer.find('\n', self.pos)
+        while end == -1 and self.fill():
+            end = self.buffer.find('\n')
+        if end == -1:
+            line, self.pos, self.is_done = self.buffer[self.pos:], len(self.buffer), True
+        else:
+            line, self.pos = self.buffer[self.pos:end], end + 1
+        if not line.strip():
+            self.index += 1
+            return None
+        try:
+            return self.get_item(json.loads(line))
+        except ValueError as exc:
+            return self.get_item(exc)
+    
+    def match(self, pattern):
+        """
+        Matches `pattern` at the read position, reading more of the body 
+        while the match may be cut off by the end of the buffer.
+        """
+        while True:
+            match = pattern.match(self.buffer, self.pos)
+            if match is not None and match.end() < len(self.buffer) or (
+                    len(self.buffer) - self.pos >= self.max_item_size or not self.fill()):
+                return match
+    
+    def decode(self):
+        """
+        Decodes the JSON value at the read position, reading more of the body
+        while it may be cut off. Raises a ValueError.
+        """
+        while True:
+            try:
+                obj, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if len(self.buffer) - self.pos < self.max_item_size and self.fill():
+                    continue
+                raise
+            # A number may go on in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return obj
+    
+    def read_start(self):
+        """
+        Moves past the opening of the `data` array, skipping the top-level 
+        members before it. Returns an error message, or None.
+        """
+        if (match := self.match(self.object_start)) is None:
+            return 'Expected a {"data": [...]} document.'
+        self.pos = match.end()
+        while (match := self.match(self.member)) is not None:
+            self.pos = match.end()
+            if json.loads(match[1]) == 'data':
+                if (match := self.match(self.array_start)) is None:
+                    return 'The "data" member must be an array.'
+                self.pos = match.end()
+                return None
+            try:
+                self.decode()
+            except ValueError:
+                break
+            if (match := self.match(self.member_end)) is None:
+                break
+            self.pos = match.end()
+        return 'Expected a {"data": [...]} document.'
+    
+    def read_element(self):
+        if not self.is_started:
+            error = self.read_start()
+            if error is not None:
+                return self.get_error(error)
+            self.is_started = True
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos == len(self.buffer):
+                if not self.fill():
+                    return self.get_error('The "data" array is not closed.')
+                continue
+            char = self.buffer[self.pos]
+            # An empty array closes before any item
+            if char == ']' and (self.expect_comma or not self.index):
+                self.is_done = True
+                return None
+            elif self.expect_comma:
+                if char != ',':
+                    return self.get_error('Expected "," or "]" after an item of "data".')
+                self.pos, self.expect_comma = self.pos + 1, False
+                continue
+            elif char in ',]':
+                return self.get_error('Expected an item of "data".')
+            try:
+                obj = self.decode()
+            except ValueError as exc:
+                self.is_done = True
+                return self.get_item(exc)
+            self.expect_comma = True
+            return self.get_item(obj)
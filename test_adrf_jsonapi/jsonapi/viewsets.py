@@ -1,36 +1,250 @@
 import time
-from django.core.exceptions import ObjectDoesNotExist
-from django.http.response import HttpResponseRedirect
+import shutil
+import asyncio
+from hashlib import md5
+from contextlib import suppress
+from functools import wraps
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.urls import NoReverseMatch, get_resolver
+from django.http.response import HttpResponse, StreamingHttpResponse
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError, MethodNotAllowed, UnsupportedMediaType
+from rest_framework.fields import empty
 from adrf.viewsets import ViewSet
 
-from .utils import JSONAPIFilter
+from .cache import cache_response, normalize_query, get_dependencies, get_versions, watch_model
+from .utils import JSONAPIFilter, JSONAPIQuery, SingleFlight, IngestReader
+from .instrumentation import sync_to_async
 from .paginations import LimitOffsetAsyncPagination
-from .serializers import JSONAPIObjectIdSerializer
+from .resources import ResourceIdentifier, ResourceObject
 from .helpers import (reverse, get_type_from_model, get_errors_formatted,
-                      get_related_field, get_related_field_objects)
+                      get_relationship_query, get_to_one_field, get_to_many_field,
+                      update_to_many_linkage, get_error_objects, get_model_type)
+
+
+def coalesced(handler):
+    """
+    Lets concurrent identical GET requests share one rendered response 
+    when `coalesce_requests` is set on the viewset.
+    """
+    @wraps(handler)
+    async def wrapper(self, request, *args, **kwargs):
+        if not self.coalesce_requests or request.method != 'GET':
+            return await handler(self, request, *args, **kwargs)
+        response = await self._flights.run(
+            self.get_request_key(request), self.render_shared, 
+            handler, request, *args, **kwargs
+        )
+        shared = HttpResponse(response.content, status=response.status_code)
+        for key, val in response.items():
+            shared[key] = val
+        return shared
+    return wrapper
 
 
 class JSONAPIViewSet(ViewSet):
     view_is_async = True
     pagination_class = LimitOffsetAsyncPagination
     filterset_class = JSONAPIFilter
+    # Set to `instrumentation.Profile` (or a subclass) to record request metrics
+    profile_class = None
+    export_chunk_size = 2000
+    # {name: query string or JSONAPIQuery}, selected with `?preset=<name>`
+    presets = {}
+    preset_query_param = 'preset'
+    export_spool_size = 1024 * 1024
+    # Concurrent identical list/retrieve requests await one in-flight response
+    coalesce_requests = False
+    _flights = SingleFlight()
+    # Seconds to cache the rendered list/retrieve responses for, see `jsonapi.cache`
+    cache_timeout = None
+    # Resource objects validated and written together by `ingest`
+    ingest_batch_size = 500
+    ingest_ndjson_media_types = ('application/x-ndjson', 'application/ndjson')
+    # Set to a `jobs.JobPool` to run large creates in the background, see `create_job`
+    job_pool = None
+    job_min_size = 10 * 1024 * 1024
+    job_spool_size = 1024 * 1024
+    # Set `JSONAPI_WARM_UP = True` to compile every viewset on the first request
+    _warmed_up = False
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if getattr(cls, 'queryset', None) is not None and (cls.cache_timeout is not None or any(
+            getattr(query, 'ttl', None) is not None for query in cls.presets.values()
+        )):
+            watch_model(cls.queryset.model)
+    
+    async def async_dispatch(self, request, *args, **kwargs):
+        if not JSONAPIViewSet._warmed_up and getattr(settings, 'JSONAPI_WARM_UP', False):
+            await self._flights.run('jsonapi:warm-up', self.warm_up)
+        if self.profile_class is None:
+            return await super().async_dispatch(request, *args, **kwargs)
+        with self.profile_class(self) as profile:
+            await profile.install()
+            response = await super().async_dispatch(request, *args, **kwargs)
+            await profile.finalize(self.request, response)
+        return response
+    
+    @staticmethod
+    async def warm_up():
+        """
+        Runs `jsonapi.warmup.warm_up()` once per process. The concurrent 
+        first requests await the same run.
+        """
+        from .warmup import warm_up
+        await warm_up()
+        JSONAPIViewSet._warmed_up = True
+    
+    @classmethod
+    def get_presets(cls):
+        """
+        Returns {name: JSONAPIQuery} and {normalized query: name} for the 
+        `presets` of the class, parsing the query strings only once.
+        """
+        if '_compiled_presets' not in cls.__dict__:
+            presets = {name: query if isinstance(query, JSONAPIQuery) 
+                       else JSONAPIQuery(query, filterset_class=cls.filterset_class)
+                       for name, query in cls.presets.items()}
+            cls._compiled_presets = presets, {query.key: name for name, query in presets.items()}
+        return cls._compiled_presets
+    
+    async def get_query(self, request):
+        """
+        Returns the preset named by `?preset=` or matching the normalized 
+        query string, otherwise the request's own parsed query.
+        """
+        presets, keys = self.get_presets()
+        name = request.query_params.get(self.preset_query_param)
+        if name is None:
+            name = keys.get(JSONAPIQuery.normalize(request.query_params))
+        elif name not in presets:
+            raise ValidationError({self.preset_query_param: [f'"{name}" is not a valid preset.']})
+        if name is not None:
+            return presets[name]
+        return JSONAPIQuery(request.query_params, filterset_class=self.filterset_class)
+    
+    def get_request_key(self, request):
+        """
+        Identifies the responses that coalesced and cached requests share: 
+        the viewset, URL, normalized JSON:API query, negotiated media type 
+        and user. Override it to share the responses between users when the 
+        queryset and permissions do not depend on the user.
+        """
+        return '{}.{}:{}://{}{}?{}:{}:{}'.format(
+            self.__class__.__module__, self.__class__.__qualname__, 
+            request.scheme, request.get_host(), request.path, 
+            normalize_query(request.query_params, (self.preset_query_param,)),
+            request.accepted_media_type, getattr(request.user, 'pk', None)
+        )
+    
+    async def get_cache_timeout(self, request):
+        """
+        The `ttl` of the preset a list request selects, otherwise 
+        `cache_timeout`.
+        """
+        if self.action == 'list':
+            ttl = (await self.get_query(request)).ttl
+            if ttl is not None:
+                return ttl
+        return self.cache_timeout
+    
+    async def get_cache_key(self, request):
+        """
+        The request key plus the versions of every type the document 
+        depends on, so a change to any of them misses the entry.
+        """
+        versions = await get_versions(get_dependencies(self.queryset.model, request.query_params))
+        return 'jsonapi:response:{}:{}'.format(
+            self.get_request_key(request),
+            md5(repr(versions).encode(), usedforsecurity=False).hexdigest()
+        )
+    
+    async def render_shared(self, handler, request, *args, **kwargs):
+        return await self.render_response(request, await handler(self, request, *args, **kwargs))
+    
+    async def render_response(self, request, response):
+        """
+        Renders a handler's `Response` ahead of `finalize_response()`.
+        """
+        if isinstance(response, Response):
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            await sync_to_async(response.render)()
+        return response
     
     # TODO: fix pagination 'last' when with filters
+    @cache_response
+    @coalesced
     async def list(self, request, pk=None):
+        query = await self.get_query(request)
+        return await self.get_list_response(request, await query.apply(self.queryset))
+    
+    async def get_list_response(self, request, queryset, context=None):
         pagination = self.pagination_class()
-        queryset = await self.filterset_class(self.queryset, request).filter_queryset()
-        objects = await pagination.paginate_queryset(queryset.order_by('id'), request=request)
+        objects = await pagination.paginate_queryset(queryset, request=request)
         data = await self.serializer(
-            objects, many=True, context={'request': request}
+            objects, many=True, context={'request': request, **(context or {})}
         ).data
         if data.get('data'):
-            response = await pagination.get_paginated_response(data)
-        else:
-            response = Response({'data': []}, status=200)
-        return response
+            return await pagination.get_paginated_response(data)
+        return Response({'data': []}, status=200)
+    
+    @action(methods=["get"], detail=False, url_name="export", url_path="export")
+    async def export(self, request):
+        """
+        Streams the whole filtered collection as one JSON:API document, 
+        serialized `export_chunk_size` rows at a time.
+        """
+        queryset = await (await self.get_query(request)).apply(self.queryset)
+        serializer = self.serializer(queryset, many=True, context={
+            'request': request, 'chunk_size': self.export_chunk_size
+        })
+        return StreamingHttpResponse(
+            self.stream_export(serializer), content_type='application/vnd.api+json'
+        )
     
+    async def stream_export(self, serializer):
+        """
+        The included resources are deduplicated by identifier and spooled 
+        to a temporary file until the primary data has been sent. The spool 
+        is written and read in a worker thread, since it rolls over to disk 
+        past `export_spool_size`.
+        
+        Only the identifiers stay in memory, one per distinct included 
+        resource, so the memory grows with the number of related rows rather 
+        than with the size of the export.
+        """
+        from tempfile import SpooledTemporaryFile
+        renderer, seen, separator = JSONRenderer(), set(), b''
+        with SpooledTemporaryFile(max_size=self.export_spool_size) as spool:
+            write = sync_to_async(spool.write, thread_sensitive=False)
+            read = sync_to_async(spool.read, thread_sensitive=False)
+            yield b'{"data":['
+            async for data, included in serializer.aiter_chunks():
+                if data:
+                    yield separator + renderer.render(data)[1:-1]
+                    separator = b','
+                rendered = []
+                for obj in included:
+                    identifier = ResourceIdentifier(obj['type'], obj['id'])
+                    if identifier not in seen:
+                        rendered.append((b',' if seen else b'') + renderer.render(obj))
+                        seen.add(identifier)
+                if rendered:
+                    await write(b''.join(rendered))
+            yield b'],"included":['
+            spool.seek(0)
+            while chunk := await read(self.export_spool_size):
+                yield chunk
+            yield b']}'
+    
+    @cache_response
+    @coalesced
     async def retrieve(self, request, pk):
         try:
             object = await self.queryset.aget(id=pk)
@@ -44,87 +258,357 @@ class JSONAPIViewSet(ViewSet):
     
     async def create(self, request):
         #startT = time.time()
-        data = request.data
+        if self.job_pool is not None and self.is_job_request(request):
+            return await self.create_job(request)
+        return await self.get_create_response(request, request.data)
+    
+    async def get_create_response(self, request, data):
+        """
+        Creates one resource object, or a list of them with one bulk write 
+        when the serializer is a model serializer, see `create_batch()`. 
+        The saved instances are rendered without reading them back; a 
+        single one is linked from the `Location` header.
+        """
         is_many = True if 'data' in data.keys() and type(data['data']) == list else False
         serializer = self.serializer(
             data=data, many=is_many, context={'request': request}
         )
-        if await serializer.is_valid():
+        headers = None
+        if await serializer.is_valid() and (
+                hasattr(serializer.child, 'write_unit_class') if is_many 
+                else hasattr(serializer, 'create')):
+            instances = await (self.create_batch(serializer) if is_many else serializer.save())
+            response_data = await self.serializer(
+                instances, many=is_many, context={'request': request}
+            ).data
+            with suppress(KeyError, TypeError):
+                headers = {'Location': response_data['data']['links']['self']}
+            status = 201
+        elif not await serializer.errors:
             response_data = await serializer.validated_data
             status = 200
         else:
             response_data = await serializer.errors
             status = 403
         #print(f'function time: {time.time() - startT}ms')
-        return Response(data=response_data, status=status)
+        return Response(data=response_data, status=status, headers=headers)
+    
+    async def create_batch(self, serializer):
+        """
+        Writes the validated list of a many serializer in one transaction, 
+        with one `bulk_create()`, and returns the instances.
+        """
+        model, validated_data = self.queryset.model, await serializer.validated_data
+        units = [serializer.child.write_unit_class(model, obj_data) for obj_data in validated_data]
+        return await sync_to_async(units[0].create_batch)(units) if units else []
+    
+    def is_job_request(self, request):
+        """
+        Creates that ask for `Prefer: respond-async` or whose body reaches 
+        `job_min_size` bytes run as background jobs, if they are lists, see 
+        `create_job()`.
+        """
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            return True
+        try:
+            return int(request.headers.get('Content-Length') or 0) >= self.job_min_size
+        except ValueError:
+            return False
+    
+    async def create_job(self, request):
+        """
+        Stores the body and queues it on `job_pool`, to be validated and 
+        written in batches like `ingest` does. Answers 202 Accepted with the 
+        job resource. A document whose `data` is not a list is parsed from 
+        the stored body and created in the request instead.
+        """
+        from tempfile import SpooledTemporaryFile
+        # The job outlives the request, so the serializer gets no context
+        serializer = self.serializer(many=True)
+        if not hasattr(serializer.child, 'write_unit_class'):
+            raise MethodNotAllowed(request.method)
+        spool = SpooledTemporaryFile(max_size=self.job_spool_size)
+        if request.stream is not None:
+            await sync_to_async(shutil.copyfileobj, thread_sensitive=False)(request.stream, spool)
+        spool.seek(0)
+        reader = IngestReader(spool, ndjson=request.content_type.split(';')[0] 
+                              in self.ingest_ndjson_media_types)
+        if not reader.ndjson:
+            if await sync_to_async(reader.read_start, thread_sensitive=False)() is not None:
+                spool.seek(0)
+                with spool:
+                    return await self.get_create_response(request, self.parse_body(request, spool))
+            reader.is_started = True
+        job = self.job_pool.submit(self.run_job, serializer, reader, spool)
+        url = self.get_job_url(request, job)
+        return Response({'data': job.to_representation(url)}, status=202, 
+                        headers={'Content-Location': url})
+    
+    def parse_body(self, request, stream):
+        parser = request.negotiator.select_parser(request, request.parsers)
+        if parser is None:
+            raise UnsupportedMediaType(request.content_type)
+        return parser.parse(stream, request.content_type, self.get_parser_context(request))
     
-    @action(methods=["get", "put"], detail=False, url_name="self",
+    async def run_job(self, job, serializer, reader, spool):
+        results = self.aiter_ingest(serializer, reader)
+        try:
+            async for result in results:
+                job.add_result(result)
+                if job.is_cancelled:
+                    break
+        finally:
+            await results.aclose()
+            spool.close()
+    
+    def get_job_url(self, request, job):
+        return self.reverse_action('jobs', kwargs={'job_id': job.id}, request=request)
+    
+    @action(methods=["get", "delete"], detail=False, url_name="jobs", 
+            url_path=r'jobs/(?P<job_id>[0-9a-f]+)')
+    async def jobs(self, request, job_id):
+        """
+        The job resource. DELETE cancels the job, see `Job.cancel()`.
+        """
+        job = self.job_pool.get(job_id) if self.job_pool is not None else None
+        if job is None:
+            return Response({'data': None}, status=404)
+        if request.method == 'DELETE':
+            job.cancel()
+        return Response({'data': job.to_representation(self.get_job_url(request, job))}, 
+                        status=200)
+    
+    @action(methods=["post"], detail=False, url_name="ingest", url_path="ingest")
+    async def ingest(self, request):
+        """
+        Bulk creates the resource objects of an NDJSON body, one per line, or 
+        of a `{"data": [...]}` document, which is read and decoded a chunk at 
+        a time. Streams back one NDJSON line per item, with its index and 
+        either its identifier or its errors, and a final `meta` line.
+        """
+        serializer = self.serializer(many=True, context={'request': request})
+        if not hasattr(serializer.child, 'write_unit_class'):
+            raise MethodNotAllowed(request.method)
+        reader = IngestReader(request.stream, ndjson=request.content_type.split(';')[0] 
+                              in self.ingest_ndjson_media_types)
+        return StreamingHttpResponse(self.stream_ingest(serializer, reader), 
+                                     content_type='application/x-ndjson')
+    
+    async def stream_ingest(self, serializer, reader):
+        renderer, meta = JSONRenderer(), {'created': 0, 'failed': 0}
+        async for result in self.aiter_ingest(serializer, reader):
+            meta['created' if 'data' in result else 'failed'] += 1
+            yield renderer.render(result) + b'\n'
+        yield renderer.render({'meta': meta}) + b'\n'
+    
+    async def aiter_ingest(self, serializer, reader):
+        """
+        Yields the result of every item. Each batch is read and validated 
+        while the previous one is written.
+        """
+        model, sections = self.queryset.model, serializer.get_error_sections()
+        obj_type, write = get_model_type(model), None
+        read = sync_to_async(reader.read, thread_sensitive=False)
+        items = await read(self.ingest_batch_size)
+        try:
+            while items or write is not None:
+                results, units = [], []
+                for index, obj_data in items:
+                    pointer = '' if reader.ndjson else f'/data/{index}'
+                    if isinstance(obj_data, ValueError):
+                        errors = get_error_objects({'data': [f'Invalid JSON: {obj_data}']}, pointer)
+                    else:
+                        obj_data, errors = await serializer.validate_item(obj_data, pointer, sections)
+                    if errors:
+                        results.append({'index': index, 'errors': errors})
+                    else:
+                        units.append((index, pointer, 
+                                      serializer.child.write_unit_class(model, obj_data)))
+                if write is not None:
+                    results = [*await write, *results]
+                write = asyncio.ensure_future(self.write_ingest_batch(units, obj_type)) \
+                    if units else None
+                for result in results:
+                    yield result
+                items = await read(self.ingest_batch_size) if items else []
+        finally:
+            if write is not None and not write.done():
+                await write
+    
+    @staticmethod
+    async def write_ingest_batch(units, obj_type):
+        instances = await sync_to_async(units[0][2].save_batch)([unit for *_, unit in units])
+        return [{'index': index, 'errors': get_error_objects({'data': [str(instance)]}, pointer)}
+                if isinstance(instance, Exception) else 
+                {'index': index, 'data': {'type': obj_type, 'id': instance.pk}}
+                for (index, pointer, _), instance in zip(units, instances)]
+    
+    @action(methods=["get", "put", "patch", "post", "delete"], detail=False, url_name="self",
             url_path=r'(?P<pk>\d+)/relationships/(?P<field_name>\w+)')
     async def self(self, request, *args, **kwargs):
-        field, data = await get_related_field(self.queryset, kwargs), None
         if request.method.lower() == 'get':
-            if hasattr(field, 'all'):
-                data = []
-                for obj in await get_related_field_objects(field):
-                    obj_data = await self.serializer.ObjectId(obj).data
-                    obj_data.update({'links': {'self': await reverse(
-                        await get_type_from_model(field.model) + '-detail',
-                        args=[obj.id], request=request
-                    )}})
-                    data.append(obj_data)
-            elif field:
-                data = await self.serializer.ObjectId(field).data
-                data['links'] = {'self': await reverse(
-                    await get_type_from_model(field.__class__) + '-detail', 
-                    args=[field.id], request=request
-                )}
-            return Response(data={'data': data})
-        elif request.method.lower() == 'put':
-            data, response_data = request.data.get('data'), []
-            data = [data] if type(data) != list else data
-            if hasattr(field, 'all'):
-                model_name = field.model
-            elif len(data) > 1:
-                serializer = self.serializer()
-                serializer._errors = {'type': [f"You can't provide more than one object."]}
-                return Response(data=await serializer.errors, status=403)
-            else:
-                model_name = field.__class__
-            model_name = await get_type_from_model(model_name)
-            for obj_data in data:
-                obj_data = JSONAPIObjectIdSerializer(
-                    data=obj_data, context={'request': request}
+            return await self.get_relationship(request, kwargs['pk'], kwargs['field_name'])
+        return await self.update_relationship(request, kwargs['pk'], kwargs['field_name'])
+
+    async def get_parent(self, request, pk, field_name=None):
+        """
+        Returns the object `pk` of the queryset once its object permissions 
+        are checked, or None if it does not exist. Only its pk is loaded, 
+        and the column of `field_name` if it is a forward to-one relation.
+        """
+        to_one = field_name and get_to_one_field(self.queryset.model, field_name)
+        queryset = self.queryset.select_related(None).prefetch_related(None)
+        try:
+            obj = await queryset.only('pk', *([to_one.attname] if to_one else ())).aget(pk=pk)
+        except ObjectDoesNotExist:
+            return None
+        await sync_to_async(self.check_object_permissions)(request, obj)
+        return obj
+    
+    async def get_relationship(self, request, pk, field_name):
+        """
+        Relationship linkage of a parent from the queryset, once its object 
+        permissions are checked. To-one linkage is read from the parent; 
+        to-many linkage is paginated and counted in `meta.count`.
+        """
+        relationship = get_relationship_query(self.queryset, pk, field_name)
+        parent = relationship and await self.get_parent(request, pk, field_name)
+        if not parent:
+            return Response({'data': None}, status=404)
+        related_model, is_many, queryset = relationship
+        obj_type, url = await get_type_from_model(related_model), None
+        with suppress(NoReverseMatch):
+            url = await reverse(obj_type + '-list', request=request)
+        get_data = lambda pk: ResourceObject(obj_type, pk, links=url and {'self': f'{url}{pk}/'})
+        if not is_many:
+            to_one = get_to_one_field(self.queryset.model, field_name)
+            rel_id = (getattr(parent, to_one.attname) if to_one is not None 
+                      else await queryset.afirst())
+            return Response({'data': None if rel_id is None else get_data(rel_id)})
+        pagination = self.pagination_class()
+        ids = [pk async for pk in await pagination.paginate_queryset(queryset, request=request)]
+        return await pagination.get_paginated_response({
+            'data': [get_data(pk) for pk in ids], 'meta': {'count': pagination.count}
+        })
+    
+    async def update_relationship(self, request, pk, field_name):
+        """
+        PUT and PATCH replace the linkage, POST adds to and DELETE removes 
+        from a to-many linkage, of a parent from the queryset whose object 
+        permissions are checked. Many-to-many linkage is changed by diff, see
+        `update_to_many_linkage()`; a to-one linkage with one update.
+        """
+        model, method = self.queryset.model, request.method.lower()
+        relationship = get_relationship_query(self.queryset, pk, field_name)
+        parent = relationship and await self.get_parent(request, pk, field_name)
+        if not parent:
+            return Response({'data': None}, status=404)
+        related_model, is_many, _ = relationship
+        to_one = get_to_one_field(model, field_name)
+        if (get_to_many_field(model, field_name) is None if is_many 
+                else to_one is None or method in ('post', 'delete')):
+            return Response({'errors': {field_name: [
+                f'The relationship does not support {method.upper()} requests.'
+            ]}}, status=403)
+        field = model._meta.get_field(field_name)
+        data = request.data.get('data', empty) if isinstance(request.data, dict) else empty
+        ids, errors = await self.validate_identifiers(
+            data, related_model, is_many, 
+            None if field.auto_created else field.get_limit_choices_to()
+        )
+        if not errors and not is_many and not ids and not to_one.null:
+            errors = {field_name: ['The relationship cannot be emptied.']}
+        if errors:
+            return Response({'errors': errors}, status=403)
+        if is_many:
+            action = {'post': 'add', 'delete': 'remove'}.get(method, 'replace')
+            if await update_to_many_linkage(self.queryset, pk, field_name, ids, action) is None:
+                return Response({'data': None}, status=404)
+        else:
+            # Saved rather than updated, so `post_save` is sent
+            setattr(parent, to_one.attname, ids[0] if ids else None)
+            await parent.asave(update_fields=[to_one.attname])
+        return Response(status=204)
+    
+    async def validate_identifiers(self, data, model, many, limit_choices_to=None):
+        """
+        Returns the pks of the resource identifier objects in `data` and 
+        the errors. The pks are checked to exist, within `limit_choices_to`,
+        with one query.
+        """
+        obj_type, pk_field = await get_type_from_model(model), model._meta.pk
+        if data is empty or many != isinstance(data, list) or not many and not (
+                data is None or isinstance(data, dict)):
+            return [], {'data': ['Expected a list of resource identifier objects.' if many
+                                 else 'Expected a resource identifier object or null.']}
+        ids, errors = [], {}
+        for item in data if many else [] if data is None else [data]:
+            if not isinstance(item, dict) or 'type' not in item or 'id' not in item:
+                errors.setdefault('data', []).append('Expected a resource identifier object.')
+            elif item['type'] != obj_type:
+                errors.setdefault('type', []).append(
+                    f"\"{item['type']}\" is not a correct object type."
                 )
-                if await obj_data.is_valid():
-                    validated_data = await obj_data.validated_data
-                    obj_type = validated_data.get('type')
-                    if obj_type == model_name:
-                        response_data.append(validated_data)
-                    else:
-                        response_data, status = {'errors': {'type': [
-                            f"\"{obj_type}\" is not a correct object type."
-                        ]}}, 403
-                else:
-                    response_data, status = await obj_data.errors, 403
-                    break
             else:
-                response_data, status = {'data': response_data}, 200
-            return Response(data=response_data, status=status)
-
+                try:
+                    ids.append(pk_field.to_python(item['id']))
+                except DjangoValidationError:
+                    errors.setdefault('id', []).append(f"\"{item['id']}\" is not a valid id.")
+        if ids and not errors:
+            queryset = model._default_manager.filter(pk__in=ids)
+            if limit_choices_to:
+                queryset = queryset.complex_filter(limit_choices_to)
+            found = {pk async for pk in queryset.values_list('pk', flat=True)}
+            errors['id'] = [f'"{pk}" does not exist.' for pk in ids if pk not in found]
+        return ids, {key: val for key, val in errors.items() if val}
+    
+    @classmethod
+    def get_model_viewset(cls, model):
+        """
+        Returns the first routed `JSONAPIViewSet` serving `model`, or None.
+        """
+        # Kept per resolver, which changes with ROOT_URLCONF
+        resolver = get_resolver()
+        cached = JSONAPIViewSet.__dict__.get('_model_viewsets')
+        if cached is None or cached[0] is not resolver:
+            from .warmup import get_viewsets
+            viewsets = {}
+            for viewset in get_viewsets():
+                viewsets.setdefault(viewset.queryset.model, viewset)
+            cached = JSONAPIViewSet._model_viewsets = resolver, viewsets
+        return cached[1].get(model)
+    
     @action(methods=["get"], detail=False, url_name="related", 
             url_path=r'(?P<pk>\d+)/(?P<field_name>\w+)')
     async def related(self, request, *args, **kwargs):
-        ids, empty_data = '', {'data': None}
-        field = await get_related_field(self.queryset, kwargs)
-        if hasattr(field, 'all'):
-            empty_data = {'data': []}
-            ids = ",".join(str(obj.id) for obj in await get_related_field_objects(field))
-            link = '{}?filter[id]={}'.format(await reverse(
-                await get_type_from_model(field.model) + '-list', request=request
-            ), ids)
-        elif field:
-            link, ids = await reverse(
-                await get_type_from_model(field.__class__) + '-detail', 
-                args=[field.id], request=request
-            ), str(field.id)
-        return HttpResponseRedirect(link) if ids else Response(empty_data, status=404)
+        """
+        Renders the related resources in place, with the pagination, filters,
+        sort and include of the related type's viewset. The parent is read 
+        from the queryset and its object permissions checked; the related 
+        queryset is filtered with a subquery on the relationship, so the 
+        related ids are never loaded.
+        """
+        relationship = get_relationship_query(
+            self.queryset, kwargs['pk'], kwargs['field_name']
+        )
+        viewset = relationship and self.get_model_viewset(relationship[0])
+        if viewset is None or not await self.get_parent(request, kwargs['pk']):
+            return Response({'data': None}, status=404)
+        _, is_many, ids = relationship
+        view = viewset(request=request, args=(), kwargs={}, action='list' if is_many 
+                       else 'retrieve', format_kwarg=self.format_kwarg)
+        await sync_to_async(view.check_permissions)(request)
+        queryset = view.queryset.filter(pk__in=ids)
+        # The resource links point to the related type, not to this URL
+        context = {'url': await reverse(
+            await get_type_from_model(queryset.model) + '-list', request=request
+        )}
+        if is_many:
+            return await view.get_list_response(
+                request, await (await view.get_query(request)).apply(queryset), context
+            )
+        data = await queryset.afirst()
+        if data is None:
+            return Response({'data': None})
+        await sync_to_async(view.check_object_permissions)(request, data)
+        return Response(await view.serializer(data, context={'request': request, **context}).data)
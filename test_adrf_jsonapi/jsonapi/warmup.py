@@ -0,0 +1,66 @@
+from time import perf_counter
+from contextlib import suppress
+from django.apps import apps
+from django.urls import get_resolver, reverse, NoReverseMatch
+
+from .helpers import get_model_type
+
+
+def get_viewsets(patterns=None):
+    """
+    Returns the `JSONAPIViewSet` classes routed by the URLconf, in URL order.
+    """
+    from .viewsets import JSONAPIViewSet
+    viewsets = {}
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if hasattr(pattern, 'url_patterns'):
+            viewsets.update(dict.fromkeys(get_viewsets(pattern.url_patterns)))
+            continue
+        cls = getattr(pattern.callback, 'cls', None)
+        if isinstance(cls, type) and issubclass(cls, JSONAPIViewSet):
+            viewsets[cls] = None
+    return list(viewsets)
+
+
+async def warm_up_viewset(viewset):
+    """
+    Compiles the serializer fields and row plan, the presets and the link
+    templates of one viewset. Returns what was compiled.
+    """
+    compiled, model = {}, viewset.queryset.model
+    obj_type = get_model_type(model)
+    serializer = viewset.serializer(context={})
+    if hasattr(type(serializer), 'compiled_fields'):
+        await serializer.compiled_fields
+    compiled['fields'] = {key: list(fields) for key, fields
+                          in (await serializer.get_resource_fields()).items()}
+    compiled['row_plan'] = await serializer.get_row_plan(viewset.queryset.all()) is not None
+    presets, _ = viewset.get_presets()
+    for query in presets.values():
+        await query.compile(viewset.queryset)
+    compiled['presets'] = list(presets)
+    compiled['links'] = {}
+    for name, args in (('list', ()), ('detail', ('0',))):
+        with suppress(NoReverseMatch):
+            compiled['links'][name] = reverse(f'{obj_type}-{name}', args=args)
+    return compiled
+
+
+async def warm_up(viewsets=None):
+    """
+    Registers the JSON:API types of every model and compiles each viewset
+    ahead of the first request. Returns a report per viewset.
+    """
+    start = perf_counter()
+    for model in apps.get_models():
+        get_model_type(model)
+    report = [{'name': 'types', 'compiled': len(apps.get_models()),
+               'seconds': round(perf_counter() - start, 6)}]
+    for viewset in get_viewsets() if viewsets is None else viewsets:
+        start = perf_counter()
+        compiled = await warm_up_viewset(viewset)
+        report.append({
+            'name': f'{viewset.__module__}.{viewset.__qualname__}', 'compiled': compiled,
+            'seconds': round(perf_counter() - start, 6)
+        })
+    return report